@@ -0,0 +1,10 @@
+import pytest
+
+from core.test_runner import isolated_settings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_project_settings(tmp_path_factory):
+    """То же, что ProjectTestRunner делает для manage.py test."""
+    with isolated_settings(str(tmp_path_factory.mktemp('yatube'))):
+        yield
@@ -0,0 +1,199 @@
+import json
+import queue
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.models import Comment, Post
+
+from .fields import COMMENT_FIELDS, POST_FIELDS, columns, serialize
+
+
+ALL_POSTS = 'posts'
+
+
+def group_posts(slug):
+    return f'posts:group:{slug}'
+
+
+def author_posts(username):
+    return f'posts:author:{username}'
+
+
+def post_comments(post_id):
+    return f'comments:{post_id}'
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+class Event:
+    """Событие SSE. id - первичный ключ объекта: по нему клиент
+    продолжает поток после переподключения (Last-Event-ID)."""
+    def __init__(self, name, id, data):
+        self.name = name
+        self.id = id
+        self.data = data
+
+    def encode(self):
+        data = json.dumps(self.data, cls=DjangoJSONEncoder)
+        return f'id: {self.id}\nevent: {self.name}\ndata: {data}\n\n'
+
+
+class Hub:
+    """Публикация событий подписчикам внутри процесса.
+
+    Каждый открытый поток держит свою очередь. Подписчик, который
+    не успевает читать, отключается: клиент переподключится
+    с Last-Event-ID и доберёт пропущенное из базы."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._count = 0
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._count >= settings.API_STREAM_MAX_CLIENTS:
+                raise TooManyStreams(channel)
+            subscription = Subscription(self, channel)
+            self._channels.setdefault(channel, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel, set())
+            if subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[subscription.channel]
+            self._count -= 1
+
+    def publish(self, channels, event):
+        with self._lock:
+            subscribers = [
+                subscription
+                for channel in channels
+                for subscription in self._channels.get(channel, ())
+            ]
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def __len__(self):
+        return self._count
+
+
+class Subscription:
+    def __init__(self, hub, channel):
+        self.hub = hub
+        self.channel = channel
+        self.queue = queue.Queue(settings.API_STREAM_QUEUE_SIZE)
+        self.dropped = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped = True
+            self.hub.unsubscribe(self)
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+hub = Hub()
+
+
+def post_events(posts):
+    rows = posts.values(
+        *columns(POST_FIELDS, POST_FIELDS)
+    )
+    return [
+        Event('post', row['id'], serialize(row, POST_FIELDS, POST_FIELDS))
+        for row in rows
+    ]
+
+
+def comment_events(comments):
+    rows = comments.values(
+        *columns(COMMENT_FIELDS, COMMENT_FIELDS)
+    )
+    return [
+        Event(
+            'comment', row['id'],
+            serialize(row, COMMENT_FIELDS, COMMENT_FIELDS),
+        )
+        for row in rows
+    ]
+
+
+def publish_post(post_id):
+    if not len(hub):
+        return
+    for event in post_events(Post.objects.filter(pk=post_id)):
+        channels = [ALL_POSTS, author_posts(event.data['author'])]
+        if event.data['group'] is not None:
+            channels.append(group_posts(event.data['group']))
+        hub.publish(channels, event)
+
+
+def publish_comment(comment_id):
+    if not len(hub):
+        return
+    for event in comment_events(Comment.objects.filter(pk=comment_id)):
+        hub.publish([post_comments(event.data['post'])], event)
+
+
+class EventStream:
+    """Тело ответа text/event-stream.
+
+    Сначала отдаёт из базы объекты новее Last-Event-ID (backlog)
+    страницами по settings.API_STREAM_BACKLOG, пока не дойдёт
+    до последнего, затем события хаба. Подписка открыта до чтения
+    backlog, так что объекты, сохранённые за это время, ждут
+    в очереди. Пока событий нет, раз в
+    settings.API_STREAM_HEARTBEAT секунд шлёт комментарий: так прокси
+    не закрывают соединение, а сервер узнаёт об ушедшем клиенте.
+    Django вызывает close() по окончании ответа, и подписка снимается,
+    даже если поток так и не начали читать."""
+    def __init__(self, subscription, backlog, last_id=None):
+        self.subscription = subscription
+        self.backlog = backlog
+        self.last_id = last_id
+
+    def read_backlog(self):
+        after_id = self.last_id
+        while True:
+            page = self.backlog(after_id)
+            for event in page:
+                after_id = event.id
+                yield event
+            if len(page) < settings.API_STREAM_BACKLOG:
+                return
+
+    def __iter__(self):
+        yield f'retry: {settings.API_STREAM_RETRY}\n\n'
+        backlog_id = 0
+        if self.last_id is not None:
+            for event in self.read_backlog():
+                backlog_id = event.id
+                yield event.encode()
+        while not self.subscription.dropped:
+            try:
+                event = self.subscription.get(settings.API_STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+                continue
+            # Объект, сохранённый во время выборки backlog, мог попасть
+            # и в неё, и в очередь.
+            if event.id > backlog_id:
+                yield event.encode()
+
+    def close(self):
+        self.subscription.close()
@@ -0,0 +1,71 @@
+from posts.models import Post
+
+
+# Имя поля в ответе API -> столбец для QuerySet.values(). Столбцы
+# связанных таблиц добавляют JOIN, только если поле запрошено.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'modified': 'modified',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'comments_count': 'comments_count',
+}
+
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+}
+
+
+class FieldError(ValueError):
+    pass
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=a,b,c или все поля, если параметра нет."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(available)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise FieldError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(available)}.'
+        )
+    return fields
+
+
+def columns(fields, available, required=()):
+    """Столбцы для values(): запрошенные и нужные для курсора."""
+    return list(dict.fromkeys(
+        [*(available[name] for name in fields), *required]
+    ))
+
+
+def _image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+def serialize(row, fields, available):
+    data = {name: row[available[name]] for name in fields}
+    if 'image' in data:
+        data['image'] = _image_url(data['image'])
+    return data
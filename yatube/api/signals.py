@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from posts.models import Comment, Post
+
+from .events import hub, publish_comment, publish_post
+
+
+@receiver(post_save, sender=Post)
+def stream_new_post(sender, instance, created, **kwargs):
+    # Без открытых потоков публикация не стоит ни одного запроса.
+    if created and len(hub):
+        transaction.on_commit(lambda: publish_post(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def stream_new_comment(sender, instance, created, **kwargs):
+    if created and len(hub):
+        transaction.on_commit(lambda: publish_comment(instance.pk))
@@ -0,0 +1,132 @@
+import json
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+from ..events import hub, publish_comment, publish_post
+
+
+@override_settings(API_STREAM_HEARTBEAT=0.01)
+class EventStreamTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост #{i}', author=cls.author)
+            for i in range(3)
+        ]
+
+    def open_stream(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b'retry: '))
+        return chunks
+
+    def read_event(self, chunks):
+        """Следующее событие потока, пропуская heartbeat."""
+        for chunk in chunks:
+            if not chunk.startswith(b':'):
+                lines = dict(
+                    line.split(': ', 1)
+                    for line in chunk.decode().strip().split('\n')
+                )
+                return lines['event'], int(lines['id']), json.loads(
+                    lines['data']
+                )
+
+    def test_resume_from_last_event_id(self):
+        """После переподключения поток сначала отдаёт из базы посты
+        новее Last-Event-ID."""
+        posts = EventStreamTest.posts
+        chunks = self.open_stream(
+            reverse('api:post_stream'), HTTP_LAST_EVENT_ID=str(posts[0].pk)
+        )
+        for post in posts[1:]:
+            event, event_id, data = self.read_event(chunks)
+            self.assertEqual((event, event_id), ('post', post.pk))
+            self.assertEqual(data['text'], post.text)
+
+    @override_settings(API_STREAM_BACKLOG=2)
+    def test_backlog_is_read_to_the_end(self):
+        """Пропущенных постов больше страницы backlog: поток выбирает
+        их страницами и отдаёт все, ничего не теряя."""
+        chunks = self.open_stream(
+            reverse('api:post_stream'), HTTP_LAST_EVENT_ID='0'
+        )
+        for post in EventStreamTest.posts:
+            self.assertEqual(self.read_event(chunks)[:2], ('post', post.pk))
+
+    def test_new_posts_are_streamed_by_channel(self):
+        """Поток группы получает только новые посты этой группы,
+        а сохранение поста ставит публикацию после фиксации."""
+        chunks = self.open_stream(
+            reverse('api:post_stream'), data={'group': 'test-slug'}
+        )
+        queued = len(connection.run_on_commit)
+        other = Post.objects.create(text='Без группы', author=self.author)
+        in_group = Post.objects.create(
+            text='В группе', author=self.author, group=self.group
+        )
+        self.assertEqual(len(connection.run_on_commit), queued + 2)
+        publish_post(other.pk)
+        publish_post(in_group.pk)
+        self.assertEqual(
+            self.read_event(chunks)[:2], ('post', in_group.pk)
+        )
+
+    def test_new_comments_are_streamed(self):
+        """Поток комментариев поста получает его новые комментарии."""
+        post = EventStreamTest.posts[0]
+        chunks = self.open_stream(reverse(
+            'api:comment_stream', kwargs={'post_id': post.pk}
+        ))
+        comment = Comment.objects.create(
+            text='Комментарий', post=post, author=self.author
+        )
+        publish_comment(comment.pk)
+        event, event_id, data = self.read_event(chunks)
+        self.assertEqual((event, event_id), ('comment', comment.pk))
+        self.assertEqual(data['text'], comment.text)
+
+    def test_heartbeat(self):
+        """Пока событий нет, поток шлёт комментарии-heartbeat."""
+        chunks = self.open_stream(reverse('api:post_stream'))
+        self.assertEqual(next(chunks), b': heartbeat\n\n')
+
+    @override_settings(API_STREAM_MAX_CLIENTS=1)
+    def test_streams_are_limited(self):
+        """Сверх предела потоков сервер отвечает 503, закрытый поток
+        освобождает место."""
+        url = reverse('api:post_stream')
+        first = self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        first.close()
+        self.open_stream(url)
+
+    @override_settings(API_STREAM_QUEUE_SIZE=1)
+    def test_slow_subscriber_is_dropped(self):
+        """Подписчик с переполненной очередью отключается, и его поток
+        заканчивается."""
+        response = self.client.get(reverse('api:post_stream'))
+        self.addCleanup(response.close)
+        count = len(hub)
+        for post in EventStreamTest.posts[:2]:
+            publish_post(post.pk)
+        self.assertEqual(len(hub), count - 1)
+        self.assertEqual(len(list(response.streaming_content)), 1)
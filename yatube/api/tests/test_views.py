@@ -0,0 +1,170 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ApiViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост #{i}',
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        cls.comment = Comment.objects.create(
+            text='Текст комментария',
+            post=cls.posts[0],
+            author=cls.author,
+        )
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pagination(self):
+        """Лента отдаётся страницами по курсору, новые посты первыми,
+        next и previous ведут на соседние страницы."""
+        expected = [post.pk for post in reversed(ApiViewsTest.posts)]
+        url = reverse('api:post_list')
+        seen = []
+        data = self.get_json(url)
+        self.assertIsNone(data['previous'])
+        while True:
+            seen += [post['id'] for post in data['results']]
+            if data['next'] is None:
+                break
+            data = self.get_json(data['next'])
+        self.assertEqual(seen, expected)
+        previous = self.get_json(data['previous'])
+        self.assertEqual(
+            [post['id'] for post in previous['results']], expected[2:4]
+        )
+
+    def test_sparse_fields(self):
+        """Из базы выбираются только столбцы запрошенных полей."""
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get_json(
+                reverse('api:post_list'), fields='id,text'
+            )
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        sql = queries[-1]['sql']
+        self.assertNotIn('"posts_post"."image"', sql)
+        self.assertNotIn('JOIN', sql)
+        data = self.get_json(reverse('api:post_list'), fields='author,group')
+        self.assertEqual(
+            data['results'],
+            [
+                {'author': 'TestUser', 'group': None},
+                {'author': 'TestUser', 'group': 'test-slug'},
+            ],
+        )
+
+    def test_filters_and_since_id(self):
+        """Посты фильтруются по группе и автору, since_id оставляет
+        только посты новее указанного."""
+        posts = ApiViewsTest.posts
+        cases = (
+            ({'group': 'test-slug'}, [posts[3].pk, posts[1].pk]),
+            ({'author': 'nobody'}, []),
+            ({'since_id': posts[2].pk}, [posts[4].pk, posts[3].pk]),
+        )
+        for params, expected in cases:
+            with self.subTest(params=params):
+                data = self.get_json(
+                    reverse('api:post_list'), fields='id', limit=10,
+                    **params
+                )
+                self.assertEqual(
+                    [post['id'] for post in data['results']], expected
+                )
+
+    def test_detail_views(self):
+        """Пост, его комментарии и группы отдаются в JSON."""
+        post = ApiViewsTest.posts[0]
+        self.assertEqual(
+            self.get_json(
+                reverse('api:post_detail', kwargs={'post_id': post.pk}),
+                fields='text,comments_count,image',
+            ),
+            {'text': post.text, 'comments_count': 1, 'image': None},
+        )
+        comments = self.get_json(
+            reverse('api:comment_list', kwargs={'post_id': post.pk})
+        )
+        self.assertEqual(
+            comments['results'][0]['text'], ApiViewsTest.comment.text
+        )
+        groups = self.get_json(reverse('api:group_list'))
+        self.assertEqual(groups['results'][0]['posts_count'], 2)
+        self.assertEqual(
+            self.get_json(reverse(
+                'api:group_detail', kwargs={'slug': 'test-slug'}
+            ))['title'],
+            ApiViewsTest.group.title,
+        )
+
+    def test_errors(self):
+        """Неверные параметры дают 400, несуществующий объект - 404."""
+        cases = (
+            (reverse('api:post_list'), {'fields': 'password'}, 400),
+            (reverse('api:post_list'), {'cursor': 'broken'}, 400),
+            (reverse('api:post_list'), {'limit': '1000'}, 400),
+            (reverse('api:post_list'), {'since_id': 'x'}, 400),
+            (reverse('api:post_detail', kwargs={'post_id': 0}), {}, 404),
+            (reverse('api:comment_list', kwargs={'post_id': 0}), {}, 404),
+            (reverse('api:group_detail', kwargs={'slug': 'no'}), {}, 404),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_etag(self):
+        """Повторный запрос с ETag получает 304, пока посты
+        не изменились."""
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Новый пост', author=ApiViewsTest.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comments_etag_follows_author_name(self):
+        """Переименование автора комментария меняет ETag списка
+        комментариев."""
+        commenter = User.objects.create_user(username='Commenter')
+        Comment.objects.create(
+            text='Ещё комментарий',
+            post=ApiViewsTest.posts[0],
+            author=commenter,
+        )
+        url = reverse(
+            'api:comment_list', kwargs={'post_id': ApiViewsTest.posts[0].pk}
+        )
+        etag = self.client.get(url)['ETag']
+        commenter.username = 'Renamed'
+        commenter.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renamed', response.content.decode())
@@ -0,0 +1,24 @@
+from django.urls import path
+
+from . import views
+
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_list,
+        name='comment_list',
+    ),
+    path('stream/posts/', views.post_stream, name='post_stream'),
+    path(
+        'stream/posts/<int:post_id>/comments/',
+        views.comment_stream,
+        name='comment_stream',
+    ),
+    path('groups/', views.group_list, name='group_list'),
+    path('groups/<slug:slug>/', views.group_detail, name='group_detail'),
+]
@@ -0,0 +1,241 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from posts.cache import (GROUPS, INDEX_PAGES, group_pages, page_validators,
+                         post_pages)
+from posts.models import Comment, Group, Post
+from posts.utils import (CURSOR_NEXT, CURSOR_PREVIOUS, CursorPaginator,
+                         decode_cursor, encode_position)
+
+from . import events
+from .fields import (COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, FieldError,
+                     columns, requested_fields, serialize)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def _not_found():
+    return _error('Не найдено.', 404)
+
+
+def api_view(view):
+    """Ошибки в параметрах запроса превращает в ответ 400 с JSON."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except (BadRequest, FieldError) as error:
+            return _error(str(error), 400)
+    return wrapper
+
+
+def _limit(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return settings.API_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= settings.API_MAX_PAGE_SIZE:
+        raise BadRequest(
+            f'limit должен быть от 1 до {settings.API_MAX_PAGE_SIZE}.'
+        )
+    return limit
+
+
+def _page_url(request, cursor):
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'?{query.urlencode()}')
+
+
+def _cursor_list(request, queryset, available):
+    """Страница объектов по курсору (created, id). Из базы выбираются
+    только столбцы запрошенных полей и ключа курсора."""
+    fields = requested_fields(request, available)
+    cursor = request.GET.get('cursor')
+    if cursor and decode_cursor(cursor) is None:
+        raise BadRequest('Неверный курсор.')
+    page = CursorPaginator(
+        queryset.values(*columns(fields, available, ['created', 'id'])),
+        _limit(request),
+    ).cursor_page(cursor)
+    next_url = previous_url = None
+    if page and page.has_next():
+        last = page[-1]
+        next_url = _page_url(request, encode_position(
+            last['created'], last['id'], CURSOR_NEXT
+        ))
+    if page and page.has_previous():
+        first = page[0]
+        previous_url = _page_url(request, encode_position(
+            first['created'], first['id'], CURSOR_PREVIOUS
+        ))
+    return JsonResponse({
+        'results': [serialize(row, fields, available) for row in page],
+        'next': next_url,
+        'previous': previous_url,
+    })
+
+
+def _object(request, queryset, available):
+    fields = requested_fields(request, available)
+    row = queryset.values(*columns(fields, available)).first()
+    if row is None:
+        return _not_found()
+    return JsonResponse(serialize(row, fields, available))
+
+
+@require_safe
+@page_validators(lambda: [INDEX_PAGES, GROUPS])
+@api_view
+def post_list(request):
+    """Лента постов, новые первыми.
+
+    Параметры: group, author - фильтры по slug группы и имени автора;
+    since_id - только посты новее указанного; fields - поля через
+    запятую; limit - размер страницы; cursor - из next и previous."""
+    posts = Post.objects.all()
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    if request.GET.get('since_id'):
+        try:
+            posts = posts.filter(pk__gt=int(request.GET['since_id']))
+        except ValueError:
+            raise BadRequest('since_id должен быть числом.')
+    return _cursor_list(request, posts, POST_FIELDS)
+
+
+@require_safe
+@page_validators(lambda post_id: [post_pages(post_id), GROUPS])
+@api_view
+def post_detail(request, post_id):
+    return _object(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+
+
+@require_safe
+# В ответе имена авторов комментариев: их переименование сбрасывает
+# набор GROUPS, поэтому он здесь нужен, как и у post_detail.
+@page_validators(lambda post_id: [post_pages(post_id), GROUPS])
+@api_view
+def comment_list(request, post_id):
+    """Комментарии к посту, новые первыми, с курсором как у ленты."""
+    if not Post.objects.filter(pk=post_id).exists():
+        return _not_found()
+    return _cursor_list(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS
+    )
+
+
+@require_safe
+@page_validators(lambda: [GROUPS, INDEX_PAGES])
+@api_view
+def group_list(request):
+    """Все группы по названию. Групп мало, поэтому без страниц."""
+    fields = requested_fields(request, GROUP_FIELDS)
+    groups = Group.objects.order_by('title').values(
+        *columns(fields, GROUP_FIELDS)
+    )
+    return JsonResponse({
+        'results': [serialize(row, fields, GROUP_FIELDS) for row in groups],
+    })
+
+
+@require_safe
+@page_validators(lambda slug: [GROUPS, group_pages(slug)])
+@api_view
+def group_detail(request, slug):
+    return _object(request, Group.objects.filter(slug=slug), GROUP_FIELDS)
+
+
+def _last_event_id(request):
+    value = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get(
+        'last_event_id'
+    )
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest('Last-Event-ID должен быть числом.')
+
+
+def _stream(channel, backlog, last_id):
+    """Ответ text/event-stream. Число потоков на процесс ограничено
+    settings.API_STREAM_MAX_CLIENTS: каждый поток занимает поток
+    сервера на всё время соединения."""
+    try:
+        subscription = events.hub.subscribe(channel)
+    except events.TooManyStreams:
+        response = _error('Слишком много открытых потоков.', 503)
+        response['Retry-After'] = settings.API_STREAM_RETRY // 1000
+        return response
+    response = StreamingHttpResponse(
+        events.EventStream(subscription, backlog, last_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Иначе nginx копит поток в буфере.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _backlog(queryset, make_events):
+    """Страница объектов новее after_id для клиента, который
+    переподключился."""
+    def backlog(after_id):
+        return make_events(
+            queryset.filter(pk__gt=after_id).order_by('pk')
+            [:settings.API_STREAM_BACKLOG]
+        )
+    return backlog
+
+
+@require_safe
+@api_view
+def post_stream(request):
+    """Новые посты по мере публикации: все, группы (?group=) или
+    автора (?author=)."""
+    posts = Post.objects.all()
+    if request.GET.get('group'):
+        slug = request.GET['group']
+        channel = events.group_posts(slug)
+        posts = posts.filter(group__slug=slug)
+    elif request.GET.get('author'):
+        username = request.GET['author']
+        channel = events.author_posts(username)
+        posts = posts.filter(author__username=username)
+    else:
+        channel = events.ALL_POSTS
+    return _stream(
+        channel,
+        _backlog(posts, events.post_events),
+        _last_event_id(request),
+    )
+
+
+@require_safe
+@api_view
+def comment_stream(request, post_id):
+    """Новые комментарии к посту по мере публикации."""
+    if not Post.objects.filter(pk=post_id).exists():
+        return _not_found()
+    return _stream(
+        events.post_comments(post_id),
+        _backlog(
+            Comment.objects.filter(post_id=post_id), events.comment_events
+        ),
+        _last_event_id(request),
+    )
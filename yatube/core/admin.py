@@ -0,0 +1,95 @@
+import os
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .media import file_response, resolve
+from .models import RequestProfile
+from .profiling import profile_path, profile_summary
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created',
+        'method',
+        'path',
+        'view_name',
+        'status_code',
+        'duration',
+        'user',
+    )
+    list_filter = ('view_name', 'created')
+    search_fields = ('path',)
+    fields = (
+        'created', 'user', 'method', 'path', 'view_name', 'status_code',
+        'duration', 'download', 'summary',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='core_requestprofile_download',
+            ),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = file_response(
+            request,
+            resolve(settings.PROFILING_DIR, profile.file_name),
+            content_type='application/octet-stream',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{profile.file_name}"'
+        )
+        return response
+
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('admin:core_requestprofile_download', args=[obj.pk]),
+            obj.file_name,
+        )
+    download.short_description = 'файл для snakeviz или pstats'
+
+    def summary(self, obj):
+        if not os.path.exists(profile_path(obj.file_name)):
+            return 'Файл профиля удалён.'
+        return format_html('<pre>{}</pre>', profile_summary(obj.file_name))
+    summary.short_description = 'самые долгие функции'
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _delete_file(obj)
+
+    def delete_queryset(self, request, queryset):
+        profiles = list(queryset)
+        super().delete_queryset(request, queryset)
+        for profile in profiles:
+            _delete_file(profile)
+
+
+def _delete_file(profile):
+    try:
+        os.remove(profile_path(profile.file_name))
+    except FileNotFoundError:
+        pass
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
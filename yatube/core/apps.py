@@ -1,5 +1,17 @@
+import atexit
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        if settings.SLOW_QUERY_LOG:
+            from .slow_queries import SlowQueryLog
+            log = SlowQueryLog.from_settings()
+            connection_created.connect(log.install, weak=False)
+            # Команды manage.py не должны терять последние записи.
+            atexit.register(log.close)
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import profiling_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Выдаёт сотруднику ключ профилирования: запрос с заголовком '
+        'X-Profile или параметром ?_profile= с этим ключом сохраняет '
+        'профиль cProfile, который виден в админке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(
+            username=options['username'], is_staff=True, is_active=True
+        ).first()
+        if user is None:
+            raise CommandError(
+                f'Нет активного сотрудника {options["username"]}.'
+            )
+        self.stdout.write(profiling_token(user))
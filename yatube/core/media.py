@@ -0,0 +1,160 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """Файл, читаемый только в пределах [start, start + length)."""
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно для заголовка Range с одним
+    диапазоном, None - отдать файл целиком, ValueError - диапазон
+    за пределами файла."""
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _range_requested(request, etag, last_modified):
+    """Range учитывается, только если If-Range совпадает с текущей
+    версией файла."""
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header is None or if_range is None:
+        return header
+    if if_range == etag or parse_http_date_safe(if_range) == last_modified:
+        return header
+    return None
+
+
+def guess_content_type(full_path):
+    return mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+
+def _sendfile(path, full_path, content_type):
+    # Тело и Range отдаёт прокси, Django только называет файл.
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT_LOCATION + quote(path)
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def _file_response(request, full_path, stat, etag, last_modified,
+                   content_type):
+    header = _range_requested(request, etag, last_modified)
+    try:
+        byte_range = parse_range(header, stat.st_size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        # Без диапазона WSGI-сервер может отдать файл через sendfile().
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(file, start, end - start + 1),
+            content_type=content_type,
+            status=206,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def resolve(root, path):
+    """Полный путь к файлу path внутри root или Http404."""
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+    return full_path
+
+
+def file_response(request, full_path, path=None, content_type=None):
+    """Ответ с файлом full_path: 304 по ETag и Last-Modified, передача
+    прокси, если указан path для settings.MEDIA_SENDFILE, или
+    FileResponse с поддержкой Range."""
+    stat = os.stat(full_path)
+    content_type = content_type or guess_content_type(full_path)
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        if path is not None and settings.MEDIA_SENDFILE:
+            response = _sendfile(path, full_path, content_type)
+        else:
+            response = _file_response(
+                request, full_path, stat, etag, last_modified, content_type
+            )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """Отдаёт файл из MEDIA_ROOT: картинки постов и их миниатюры.
+
+    Если перед Django стоит nginx или Apache (settings.MEDIA_SENDFILE),
+    сам файл отдаёт прокси по заголовку X-Accel-Redirect или X-Sendfile.
+    Иначе файл отдаётся FileResponse с поддержкой Range."""
+    response = file_response(
+        request, resolve(settings.MEDIA_ROOT, path), path=path
+    )
+    # Картинки и миниатюры называются по хэшу содержимого
+    # и не перезаписываются.
+    patch_cache_control(
+        response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE,
+        immutable=True,
+    )
+    return response
@@ -0,0 +1,295 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_safe
+
+
+SALT = 'core.metrics'
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+COUNTERS = {
+    'yatube_requests_total': 'Ответы по view и коду статуса.',
+}
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': 'Время обработки запроса по view.',
+    'yatube_db_duration_seconds': 'Время запросов к базе за запрос по view.',
+    'yatube_template_render_seconds': 'Время рендера шаблона.',
+}
+
+
+# Метрики, которые и так общие для всех процессов (например, лежат
+# в кэше): функции без аргументов, возвращающие кортежи
+# (имя, тип, описание, значение).
+_collectors = []
+
+
+def register_collector(collector):
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def _labels_key(labels):
+    return json.dumps(sorted(labels.items()), ensure_ascii=False)
+
+
+class Registry:
+    """Метрики процесса.
+
+    Каждый процесс держит метрики в памяти и не чаще раза
+    в settings.METRICS_FLUSH_INTERVAL секунд сохраняет их в свой файл
+    в settings.METRICS_DIR. Страница метрик складывает файлы всех
+    процессов, поэтому видит все воркеры, а не только свой. В имени
+    файла кроме pid случайная метка: процесс, получивший pid
+    завершившегося, не перезапишет его файл."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.label = uuid.uuid4().hex[:8]
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = 0
+
+    def _check_fork(self):
+        # После fork потомок не должен выдавать метрики родителя
+        # за свои.
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def inc(self, name, labels, value=1):
+        key = _labels_key(labels)
+        with self._lock:
+            self._check_fork()
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = _labels_key(labels)
+        with self._lock:
+            self._check_fork()
+            series = self.histograms.setdefault(name, {})
+            histogram = series.setdefault(
+                key, {'buckets': [0] * len(BUCKETS), 'sum': 0, 'count': 0}
+            )
+            index = bisect_left(BUCKETS, value)
+            if index < len(BUCKETS):
+                histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @property
+    def path(self):
+        return os.path.join(
+            settings.METRICS_DIR, f'metrics-{self.pid}-{self.label}.json'
+        )
+
+    def flush(self):
+        with self._lock:
+            self._check_fork()
+            data = json.dumps(
+                {'counters': self.counters, 'histograms': self.histograms},
+                ensure_ascii=False,
+            )
+            self.flushed = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(data)
+        os.replace(tmp_path, self.path)
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+registry = Registry()
+
+
+def _merge(total, data):
+    for name, series in data['counters'].items():
+        merged = total['counters'].setdefault(name, {})
+        for key, value in series.items():
+            merged[key] = merged.get(key, 0) + value
+    for name, series in data['histograms'].items():
+        merged = total['histograms'].setdefault(name, {})
+        for key, histogram in series.items():
+            target = merged.setdefault(
+                key, {'buckets': [0] * len(BUCKETS), 'sum': 0, 'count': 0}
+            )
+            target['buckets'] = [
+                a + b for a, b in zip(target['buckets'], histogram['buckets'])
+            ]
+            target['sum'] += histogram['sum']
+            target['count'] += histogram['count']
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_stale(path):
+    """Файл завершившегося процесса или давно не обновлявшийся."""
+    try:
+        pid = int(os.path.basename(path).split('-')[1])
+        age = time.time() - os.path.getmtime(path)
+    except (IndexError, ValueError, OSError):
+        return False
+    if pid <= 0 or pid != os.getpid() and not _process_alive(pid):
+        return True
+    return age > settings.METRICS_FILE_MAX_AGE
+
+
+def collect():
+    """Метрики всех живых процессов. Файлы завершившихся процессов
+    и не обновлявшиеся settings.METRICS_FILE_MAX_AGE секунд удаляются:
+    их счётчики пропадают из суммы, и Prometheus видит это как сброс
+    счётчика."""
+    total = {'counters': {}, 'histograms': {}}
+    pattern = os.path.join(settings.METRICS_DIR, 'metrics-*.json')
+    for path in glob.glob(pattern):
+        if _is_stale(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path, encoding='utf-8') as file:
+                _merge(total, json.load(file))
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def _format_labels(key, **extra):
+    pairs = [*json.loads(key), *extra.items()]
+    if not pairs:
+        return ''
+    labels = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in pairs
+    )
+    return '{' + labels + '}'
+
+
+def render(data):
+    """Метрики в текстовом формате Prometheus."""
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for key, value in sorted(data['counters'].get(name, {}).items()):
+            lines.append(f'{name}{_format_labels(key)} {value}')
+    for name, help_text in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, histogram in sorted(data['histograms'].get(name, {}).items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram['buckets']):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{_format_labels(key, le=bound)} '
+                    f'{cumulative}'
+                )
+            lines += [
+                f'{name}_bucket{_format_labels(key, le="+Inf")} '
+                f'{histogram["count"]}',
+                f'{name}_sum{_format_labels(key)} {histogram["sum"]}',
+                f'{name}_count{_format_labels(key)} {histogram["count"]}',
+            ]
+    for collector in _collectors:
+        for name, kind, help_text, value in collector():
+            lines += [
+                f'# HELP {name} {help_text}', f'# TYPE {name} {kind}',
+                f'{name} {value}',
+            ]
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Время ответа, коды статуса и время запросов к базе по имени
+    view (resolver_match.view_name). Время базы берётся у
+    core.queries.QueryCountMiddleware, который должен стоять ниже."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        labels = {'view': match.view_name if match else '<unresolved>'}
+        registry.observe('yatube_request_duration_seconds', labels, duration)
+        registry.inc(
+            'yatube_requests_total',
+            {**labels, 'status': response.status_code},
+        )
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None:
+            registry.observe(
+                'yatube_db_duration_seconds', labels, recorder.duration
+            )
+        registry.maybe_flush()
+        return response
+
+
+def metrics_token(user):
+    """Подписанный ключ для сборщика метрик. Срока действия нет:
+    ключ перестаёт действовать, когда user перестаёт быть
+    сотрудником."""
+    return signing.Signer(salt=SALT).sign(str(user.pk))
+
+
+def _token_allowed(token):
+    try:
+        pk = signing.Signer(salt=SALT).unsign(token)
+    except signing.BadSignature:
+        return False
+    return get_user_model().objects.filter(
+        pk=pk, is_staff=True, is_active=True
+    ).exists()
+
+
+def _allowed(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if authorization.startswith('Bearer '):
+        return _token_allowed(authorization[len('Bearer '):])
+    return request.user.is_active and request.user.is_staff
+
+
+@require_safe
+def metrics(request):
+    """Страница метрик для Prometheus. Доступна сотрудникам и по
+    ключу из manage.py metrics_token в заголовке
+    Authorization: Bearer <ключ>."""
+    if not _allowed(request):
+        raise Http404
+    registry.flush()
+    return HttpResponse(
+        render(collect()), content_type='text/plain; version=0.0.4'
+    )
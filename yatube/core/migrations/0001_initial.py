@@ -0,0 +1,36 @@
+# Generated by Django 2.2.19 on 2026-10-18 02:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='дата создания')),
+                ('method', models.CharField(max_length=10, verbose_name='метод')),
+                ('path', models.TextField(verbose_name='адрес')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='view')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='статус')),
+                ('duration', models.FloatField(verbose_name='время, с')),
+                ('file_name', models.CharField(max_length=200, verbose_name='файл профиля')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='кто запросил')),
+            ],
+            options={
+                'verbose_name': 'профиль запроса',
+                'verbose_name_plural': 'профили запросов',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
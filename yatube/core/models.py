@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 
@@ -10,3 +11,31 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class RequestProfile(CreatedModel):
+    """Профиль cProfile одного запроса, снятый по запросу сотрудника
+    (core.profiling.ProfilingMiddleware). Сам профиль лежит в файле
+    settings.PROFILING_DIR."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name='кто запросил',
+    )
+    method = models.CharField(verbose_name='метод', max_length=10)
+    path = models.TextField(verbose_name='адрес')
+    view_name = models.CharField(
+        verbose_name='view', max_length=200, blank=True
+    )
+    status_code = models.PositiveSmallIntegerField(verbose_name='статус')
+    duration = models.FloatField(verbose_name='время, с')
+    file_name = models.CharField(verbose_name='файл профиля', max_length=200)
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'профиль запроса'
+        verbose_name_plural = 'профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
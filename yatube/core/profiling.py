@@ -0,0 +1,98 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+from .models import RequestProfile
+
+
+SALT = 'core.profiling'
+HEADER = 'HTTP_X_PROFILE'
+PARAM = '_profile'
+
+
+def profiling_token(user):
+    """Подписанный ключ, по которому запросы user профилируются.
+    Действует settings.PROFILING_TOKEN_MAX_AGE секунд."""
+    return signing.TimestampSigner(salt=SALT).sign(str(user.pk))
+
+
+def token_user(token):
+    """Сотрудник, выдавший ключ, или None для неверного ключа."""
+    try:
+        pk = signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(
+        pk=pk, is_staff=True, is_active=True
+    ).first()
+
+
+def profile_path(file_name):
+    return os.path.join(settings.PROFILING_DIR, file_name)
+
+
+def profile_summary(file_name, limit=None):
+    """Самые долгие функции профиля по суммарному времени."""
+    output = io.StringIO()
+    stats = pstats.Stats(profile_path(file_name), stream=output)
+    stats.sort_stats('cumulative').print_stats(
+        limit or settings.PROFILING_SUMMARY_LINES
+    )
+    return output.getvalue()
+
+
+def _path_without_token(request):
+    query = request.GET.copy()
+    query.pop(PARAM, None)
+    if not query:
+        return request.path
+    return f'{request.path}?{query.urlencode()}'
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос cProfile, если в заголовке X-Profile или
+    параметре ?_profile= передан ключ из profiling_token.
+
+    Без ключа middleware только проверяет наличие заголовка
+    и параметра. Профиль сохраняется в settings.PROFILING_DIR
+    и открывается в админке, его номер - в заголовке X-Profile-Id."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.META.get(HEADER) or request.GET.get(PARAM)
+        user = token_user(token) if token else None
+        if user is None:
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+        file_name = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex}.prof'
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        profiler.dump_stats(profile_path(file_name))
+        match = request.resolver_match
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=_path_without_token(request),
+            view_name=match.view_name if match else '',
+            status_code=response.status_code,
+            duration=duration,
+            file_name=file_name,
+        )
+        response['X-Profile-Id'] = profile.pk
+        return response
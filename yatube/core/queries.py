@@ -0,0 +1,104 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Списки параметров IN (%s, %s, ...) разной длины - одна форма запроса.
+PARAMS_LIST = re.compile(r'\(\s*%s(\s*,\s*%s)*\s*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """SQL без параметров: запросы одной формы отличаются только
+    значениями параметров."""
+    return PARAMS_LIST.sub('(...)', sql)
+
+
+class QueryRecorder:
+    """Считает запросы ко всем базам, их общее время и формы."""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            return stack.pop_all()
+
+    def repeated(self):
+        """Формы, повторённые не меньше settings.QUERY_REPEAT_THRESHOLD
+        раз: обычно это N+1 - запрос в цикле по объектам."""
+        return {
+            shape: count for shape, count in self.shapes.most_common()
+            if count >= settings.QUERY_REPEAT_THRESHOLD
+        }
+
+
+class QueryCountMiddleware:
+    """Записывает для каждого запроса число SQL-запросов, их время
+    и повторяющиеся формы в лог core.queries, а при DEBUG - ещё
+    и в заголовки ответа.
+
+    Бюджеты запросов задаются в settings.QUERY_BUDGETS по имени url
+    ('posts:index'). Превышение бюджета пишется в лог как
+    предупреждение, а при settings.QUERY_BUDGET_RAISE (в тестах)
+    бросает QueryBudgetExceeded."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        # Время запросов к базе берёт и core.metrics.MetricsMiddleware.
+        request.query_recorder = recorder
+        with recorder.record():
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else None
+        repeated = recorder.repeated()
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        over_budget = budget is not None and recorder.count > budget
+        logger.log(
+            logging.WARNING if repeated or over_budget else logging.INFO,
+            json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'queries': recorder.count,
+                'duration_ms': round(recorder.duration * 1000, 2),
+                'budget': budget,
+                'repeated': repeated,
+            }, ensure_ascii=False),
+        )
+        if settings.DEBUG:
+            response['X-Query-Count'] = recorder.count
+            response['X-Query-Time'] = f'{recorder.duration * 1000:.2f}'
+            response['X-Query-Repeated'] = sum(repeated.values())
+        if over_budget and settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(
+                f'{view_name}: {recorder.count} запросов при бюджете '
+                f'{budget}'
+            )
+        return response
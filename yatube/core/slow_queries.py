@@ -0,0 +1,157 @@
+import inspect
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connections
+
+
+PARAM_MAX_LENGTH = 200
+
+_origin = ContextVar('slow_query_origin', default=None)
+
+
+def _command_origin():
+    """manage.py <команда> для запросов вне обработки страницы."""
+    if len(sys.argv) > 1:
+        return f'{os.path.basename(sys.argv[0])} {sys.argv[1]}'
+    return os.path.basename(sys.argv[0])
+
+
+def current_origin():
+    return _origin.get() or _command_origin()
+
+
+class QueryOriginMiddleware:
+    """Запоминает view, которая обрабатывает запрос, чтобы отнести
+    к ней медленные запросы к базе."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _origin.set(f'{request.method} {request.path}')
+        try:
+            return self.get_response(request)
+        finally:
+            _origin.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = inspect.unwrap(view_func)
+        _origin.set(f'{view.__module__}.{view.__qualname__}')
+
+
+def _param(value):
+    text = repr(value)
+    if len(text) > PARAM_MAX_LENGTH:
+        return text[:PARAM_MAX_LENGTH] + '…'
+    return text
+
+
+class SlowQueryLog:
+    """Журнал запросов к базе дольше threshold_ms миллисекунд.
+
+    Обёртка запросов только замеряет время и кладёт медленный запрос
+    в очередь. План запроса (EXPLAIN QUERY PLAN) и запись в файл
+    с ротацией делает фоновый поток, поэтому страница не ждёт ни
+    того, ни другого."""
+    def __init__(self, path, threshold_ms, max_bytes, backups):
+        self.threshold = threshold_ms / 1000
+        self.logger = logging.Logger(__name__)
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(
+            target=self._write, name='slow-query-log', daemon=True
+        )
+        self.thread.start()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            settings.SLOW_QUERY_LOG,
+            settings.SLOW_QUERY_THRESHOLD_MS,
+            settings.SLOW_QUERY_LOG_MAX_BYTES,
+            settings.SLOW_QUERY_LOG_BACKUPS,
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.queue.put((
+                    datetime.now(timezone.utc), context['connection'].alias,
+                    current_origin(), duration, sql, params, many,
+                ))
+
+    def install(self, sender=None, connection=None, **kwargs):
+        """Обработчик connection_created: подключает журнал
+        к новому соединению."""
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def explain(self, alias, sql, params):
+        connection = connections[alias]
+        if (connection.vendor != 'sqlite'
+                or not sql.lstrip().upper().startswith('SELECT')):
+            return None
+        try:
+            # Курсор соединения фонового потока без обёрток запросов,
+            # чтобы сам EXPLAIN не попал в журнал.
+            with connection.cursor() as cursor:
+                cursor.cursor.execute(
+                    'EXPLAIN QUERY PLAN ' + sql, tuple(params or ())
+                )
+                return [row[-1] for row in cursor.fetchall()]
+        except Exception as error:
+            return [f'Ошибка EXPLAIN: {error}']
+
+    def _write(self):
+        while True:
+            entry = self.queue.get()
+            try:
+                if entry is not None:
+                    self._log(*entry)
+            finally:
+                self.queue.task_done()
+            if entry is None:
+                connections.close_all()
+                return
+
+    def _log(self, when, alias, origin, duration, sql, params, many):
+        if many:
+            # executemany: наборов параметров много, плана нет.
+            params, plan = [], None
+        else:
+            plan = self.explain(alias, sql, params)
+        self.logger.warning(json.dumps({
+            'time': when.isoformat(),
+            'database': alias,
+            'origin': origin,
+            'duration_ms': round(duration * 1000, 2),
+            'sql': sql,
+            'params': [_param(value) for value in params or ()],
+            'plan': plan,
+        }, ensure_ascii=False))
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        for handler in self.logger.handlers:
+            handler.close()
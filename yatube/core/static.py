@@ -0,0 +1,44 @@
+import re
+
+from django.conf import settings
+from django.http import Http404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from .media import file_response, guess_content_type, resolve
+
+
+# Имя, в которое ManifestStaticFilesStorage добавил хэш: logo.1a2b3c4d5e6f.png
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+
+@require_safe
+def serve(request, path):
+    """Отдаёт файлы из STATIC_ROOT, собранные collectstatic.
+
+    Если клиент принимает gzip и рядом лежит сжатая копия, отдаётся
+    она. Файлы с хэшем в имени кэшируются навсегда."""
+    full_path = resolve(settings.STATIC_ROOT, path)
+    content_type = None
+    gzipped = False
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        try:
+            gzip_path = resolve(settings.STATIC_ROOT, f'{path}.gz')
+        except Http404:
+            pass
+        else:
+            content_type = guess_content_type(full_path)
+            full_path = gzip_path
+            gzipped = True
+    response = file_response(request, full_path, content_type=content_type)
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if HASHED_NAME.search(path):
+        patch_cache_control(
+            response, public=True, max_age=settings.STATIC_CACHE_MAX_AGE,
+            immutable=True,
+        )
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -0,0 +1,46 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class GzipManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшем содержимого в именах и рядом лежащими сжатыми
+    копиями .gz, которые создаёт collectstatic.
+
+    Манифест читается один раз при создании хранилища, поэтому
+    {% static %} ищет имена в памяти. Пока collectstatic не запускали
+    (разработка, тесты), отдаются исходные имена."""
+    gzip_extensions = (
+        '.css', '.js', '.svg', '.ico', '.txt', '.json', '.map', '.xml',
+    )
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(self.gzip_extensions) and self.exists(name):
+                if self.compress(name):
+                    yield name, f'{name}.gz', True
+
+    def compress(self, name):
+        """Записывает name.gz, если сжатие уменьшает файл."""
+        with self.open(name) as file:
+            content = file.read()
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) >= len(content):
+            return False
+        path = self.path(f'{name}.gz')
+        with open(path, 'wb') as file:
+            file.write(compressed)
+        stat = os.stat(self.path(name))
+        os.utime(path, (stat.st_atime, stat.st_mtime))
+        return True
@@ -0,0 +1,31 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import registry
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            registry.observe(
+                'yatube_template_render_seconds',
+                {'template': self.template.name or '<string>'},
+                time.perf_counter() - start,
+            )
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, которые замеряют время своего рендера
+    для core.metrics."""
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
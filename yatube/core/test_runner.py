@@ -0,0 +1,55 @@
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+queries_logger = logging.getLogger('core.queries')
+
+
+class isolated_settings(override_settings):
+    """Настройки тестов, общие для manage.py test и pytest.
+
+    Превышение бюджета запросов роняет тест. Кэш и метрики лежат во
+    временном каталоге, а не в каталогах проекта: иначе тесты увидят
+    страницы и счётчики прошлых запусков. Строки лога core.queries
+    о каждом запросе не печатаются, остаются только предупреждения;
+    тесты проверяют лог через assertLogs."""
+    def __init__(self, tmp_dir):
+        super().__init__(
+            CACHES={
+                'default': {
+                    **settings.CACHES['default'],
+                    'LOCATION': os.path.join(tmp_dir, 'cache'),
+                },
+            },
+            METRICS_DIR=os.path.join(tmp_dir, 'metrics'),
+            QUERY_BUDGET_RAISE=True,
+        )
+
+    def enable(self):
+        super().enable()
+        self.queries_level = queries_logger.level
+        queries_logger.setLevel(logging.WARNING)
+
+    def disable(self):
+        queries_logger.setLevel(self.queries_level)
+        super().disable()
+
+
+class ProjectTestRunner(DiscoverRunner):
+    """Запускает тесты с isolated_settings."""
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.isolated_settings = isolated_settings(self.tmp_dir)
+        self.isolated_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.isolated_settings.disable()
+        super().teardown_test_environment(**kwargs)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.utils.http import http_date
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+CONTENT = b'0123456789'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        cls.path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'file.gif')
+        with open(cls.path, 'wb') as file:
+            file.write(CONTENT)
+        cls.url = settings.MEDIA_URL + 'posts/file.gif'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_serves_file_with_cache_headers(self):
+        """Файл отдаётся целиком с долгим кэшированием."""
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertIn('ETag', response)
+
+    def test_range_requests(self):
+        """Range отдаёт часть файла, а диапазон за концом файла - 416."""
+        ranges = {
+            'bytes=2-5': (206, b'2345', 'bytes 2-5/10'),
+            'bytes=7-': (206, b'789', 'bytes 7-9/10'),
+            'bytes=-3': (206, b'789', 'bytes 7-9/10'),
+            'bytes=0-100': (206, CONTENT, 'bytes 0-9/10'),
+            'bytes=20-': (416, b'', 'bytes */10'),
+        }
+        for header, (status, body, content_range) in ranges.items():
+            with self.subTest(range=header):
+                response = self.guest_client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['Content-Range'], content_range)
+                if status == 206:
+                    self.assertEqual(
+                        b''.join(response.streaming_content), body
+                    )
+                    self.assertEqual(
+                        int(response['Content-Length']), len(body)
+                    )
+
+    def test_stale_if_range_gives_whole_file(self):
+        """При устаревшем If-Range отдаётся весь файл."""
+        response = self.guest_client.get(
+            self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_requests(self):
+        """If-Modified-Since и If-None-Match дают 304."""
+        etag = self.guest_client.get(self.url)['ETag']
+        headers = [
+            {'HTTP_IF_NONE_MATCH': etag},
+            {'HTTP_IF_MODIFIED_SINCE': http_date(
+                os.path.getmtime(self.path) + 1
+            )},
+        ]
+        for header in headers:
+            with self.subTest(header=header):
+                response = self.guest_client.get(self.url, **header)
+                self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_outside_files_are_not_found(self):
+        """Несуществующий файл, каталог и путь за MEDIA_ROOT дают 404."""
+        for path in ('posts/missing.gif', 'posts', '../settings.py'):
+            with self.subTest(path=path):
+                response = self.guest_client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, 404)
+
+    def test_sendfile_headers(self):
+        """С прокси Django только передаёт ему путь к файлу."""
+        cases = {
+            'x-accel-redirect': (
+                'X-Accel-Redirect',
+                settings.MEDIA_ACCEL_REDIRECT_LOCATION + 'posts/file.gif',
+            ),
+            'x-sendfile': ('X-Sendfile', self.path),
+        }
+        for backend, (header, value) in cases.items():
+            with self.subTest(backend=backend), \
+                    override_settings(MEDIA_SENDFILE=backend):
+                response = self.guest_client.get(self.url)
+                self.assertEqual(response[header], value)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['Content-Type'], 'image/gif')
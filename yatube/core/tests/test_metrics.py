@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import metrics_token, registry
+
+
+User = get_user_model()
+
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        for name in os.listdir(TEMP_METRICS_DIR):
+            os.remove(os.path.join(TEMP_METRICS_DIR, name))
+        self.guest_client = Client()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(
+            username='Staff', is_staff=True
+        )
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def get_metrics(self):
+        response = self.guest_client.get(
+            reverse('metrics'),
+            HTTP_AUTHORIZATION=f'Bearer {metrics_token(MetricsTest.staff)}',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_metrics(self):
+        """Страница метрик показывает ответы, время ответа, время базы
+        и рендера шаблонов по view."""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        metrics = self.get_metrics()
+        lines = (
+            'yatube_requests_total{status="200",view="posts:index"} 2',
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            'yatube_db_duration_seconds_count{view="posts:index"} 2',
+            # Второй ответ анониму взят из кэша страниц, без рендера.
+            'yatube_template_render_seconds_count'
+            '{template="posts/index.html"} 1',
+        )
+        for line in lines:
+            with self.subTest(line=line):
+                self.assertIn(line, metrics.splitlines())
+
+    def test_page_cache_metrics(self):
+        """Страница метрик показывает попадания в кэш страниц."""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        lines = self.get_metrics().splitlines()
+        self.assertIn('yatube_page_cache_hits_total 1', lines)
+        self.assertIn('yatube_page_cache_misses_total 1', lines)
+
+    def write_process_file(self, name):
+        """Файл метрик другого процесса с теми же данными, что у этого."""
+        self.guest_client.get(reverse('posts:index'))
+        registry.flush()
+        with open(registry.path, encoding='utf-8') as file:
+            data = json.load(file)
+        path = os.path.join(TEMP_METRICS_DIR, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        return path
+
+    def test_metrics_of_all_processes_are_summed(self):
+        """Метрики других процессов берутся из их файлов."""
+        self.write_process_file(f'metrics-{os.getppid()}-other.json')
+        self.assertIn(
+            'yatube_requests_total{status="200",view="posts:index"} 2',
+            self.get_metrics().splitlines(),
+        )
+
+    def test_files_of_dead_processes_are_removed(self):
+        """Файл завершившегося процесса удаляется и не суммируется."""
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        path = self.write_process_file(f'metrics-{process.pid}-dead.json')
+        self.assertIn(
+            'yatube_requests_total{status="200",view="posts:index"} 1',
+            self.get_metrics().splitlines(),
+        )
+        self.assertFalse(os.path.exists(path))
+
+    def test_stale_files_are_removed(self):
+        """Давно не обновлявшийся файл удаляется."""
+        path = self.write_process_file(f'metrics-{os.getppid()}-old.json')
+        stale = time.time() - settings.METRICS_FILE_MAX_AGE - 1
+        os.utime(path, (stale, stale))
+        self.assertIn(
+            'yatube_requests_total{status="200",view="posts:index"} 1',
+            self.get_metrics().splitlines(),
+        )
+        self.assertFalse(os.path.exists(path))
+
+    def test_process_files_have_unique_names(self):
+        """Процесс с тем же pid не перезапишет файл прежнего."""
+        path = registry.path
+        registry.clear()
+        self.assertNotEqual(registry.path, path)
+
+    def test_metrics_are_private(self):
+        """Страница метрик открывается только сотруднику и по ключу
+        действующего сотрудника."""
+        url = reverse('metrics')
+        staff_client = Client()
+        staff_client.force_login(MetricsTest.staff)
+        user_client = Client()
+        user_client.force_login(MetricsTest.user)
+        self.assertEqual(staff_client.get(url).status_code, 200)
+        denied = {
+            'гость': self.guest_client.get(url),
+            'пользователь': user_client.get(url),
+            'с локального адреса': self.guest_client.get(
+                url, REMOTE_ADDR='127.0.0.1'
+            ),
+            'неверный ключ': self.guest_client.get(
+                url, HTTP_AUTHORIZATION='Bearer 1:неверный'
+            ),
+            'ключ не сотрудника': self.guest_client.get(
+                url, HTTP_AUTHORIZATION='Bearer ' + metrics_token(
+                    MetricsTest.user
+                ),
+            ),
+        }
+        for name, response in denied.items():
+            with self.subTest(name=name):
+                self.assertEqual(response.status_code, 404)
+
+    def test_metrics_token_command(self):
+        """Команда выдаёт ключ только сотруднику."""
+        out = StringIO()
+        call_command('metrics_token', MetricsTest.staff.username, stdout=out)
+        self.assertEqual(
+            out.getvalue().strip(), metrics_token(MetricsTest.staff)
+        )
+        with self.assertRaises(CommandError):
+            call_command('metrics_token', MetricsTest.user.username)
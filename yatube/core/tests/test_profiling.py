@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import RequestProfile
+from ..profiling import profile_path, profiling_token, token_user
+
+
+User = get_user_model()
+
+TEMP_PROFILING_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(PROFILING_DIR=TEMP_PROFILING_DIR)
+class ProfilingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_superuser(
+            username='Staff', email='staff@example.com', password='pass'
+        )
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILING_DIR, ignore_errors=True)
+
+    def test_request_is_profiled_by_token(self):
+        """Запрос с ключом сотрудника в заголовке или параметре
+        профилируется, ключ в адрес профиля не попадает."""
+        token = profiling_token(ProfilingTest.staff)
+        cases = (
+            ({'HTTP_X_PROFILE': token}, {}),
+            ({}, {'_profile': token, 'page': '1'}),
+        )
+        for headers, params in cases:
+            with self.subTest(headers=headers, params=params):
+                cache.clear()
+                response = self.guest_client.get(
+                    reverse('posts:index'), params, **headers
+                )
+                profile = RequestProfile.objects.get(
+                    pk=response['X-Profile-Id']
+                )
+                self.assertEqual(profile.view_name, 'posts:index')
+                self.assertEqual(profile.user, ProfilingTest.staff)
+                self.assertNotIn(token, profile.path)
+                self.assertTrue(
+                    os.path.exists(profile_path(profile.file_name))
+                )
+
+    def test_request_without_valid_token_is_not_profiled(self):
+        """Без ключа, с поддельным, просроченным или чужим ключом
+        запрос не профилируется."""
+        token = profiling_token(ProfilingTest.staff)
+        cases = (
+            ({}, {}),
+            ({'HTTP_X_PROFILE': token + 'x'}, {}),
+            ({'HTTP_X_PROFILE': profiling_token(ProfilingTest.user)}, {}),
+            ({'HTTP_X_PROFILE': token}, {'PROFILING_TOKEN_MAX_AGE': -1}),
+        )
+        for headers, limits in cases:
+            with self.subTest(headers=headers), override_settings(**limits):
+                response = self.guest_client.get(
+                    reverse('posts:index'), **headers
+                )
+                self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_profile_in_admin(self):
+        """В админке виден разбор профиля и скачивается его файл."""
+        response = self.guest_client.get(
+            reverse('posts:index'),
+            HTTP_X_PROFILE=profiling_token(ProfilingTest.staff),
+        )
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        admin_client = Client()
+        admin_client.force_login(ProfilingTest.staff)
+        response = admin_client.get(reverse(
+            'admin:core_requestprofile_change', args=[profile.pk]
+        ))
+        self.assertContains(response, 'cumulative')
+        self.assertContains(response, 'posts/views.py')
+        response = admin_client.get(reverse(
+            'admin:core_requestprofile_download', args=[profile.pk]
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_token_command(self):
+        """Команда выдаёт ключ только сотруднику."""
+        out = StringIO()
+        call_command('profiling_token', 'Staff', stdout=out)
+        self.assertEqual(
+            token_user(out.getvalue().strip()), ProfilingTest.staff
+        )
+        with self.assertRaises(CommandError):
+            call_command('profiling_token', 'TestUser', stdout=out)
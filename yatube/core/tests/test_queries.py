@@ -0,0 +1,74 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..queries import QueryBudgetExceeded, QueryRecorder, query_shape
+
+
+User = get_user_model()
+
+
+class QueryCountMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'User{i}') for i in range(3)
+        ]
+
+    def test_repeated_shapes(self):
+        """Запросы одной формы с разными параметрами считаются вместе."""
+        recorder = QueryRecorder()
+        with recorder.record():
+            for user in QueryCountMiddlewareTest.users:
+                User.objects.get(pk=user.pk)
+            User.objects.filter(pk__in=[1, 2]).first()
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(list(recorder.repeated().values()), [3])
+        self.assertEqual(
+            query_shape('WHERE "id" IN (%s, %s, %s)'),
+            query_shape('WHERE "id" IN (%s)'),
+        )
+
+    def test_request_is_logged(self):
+        """Число и время запросов страницы пишутся в лог в JSON."""
+        with self.assertLogs('core.queries', 'INFO') as logs:
+            self.guest_client.get(reverse('posts:index'))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['repeated'], {})
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        """При DEBUG статистика запросов есть в заголовках ответа."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertEqual(response['X-Query-Repeated'], '0')
+        self.assertIn('X-Query-Time', response)
+
+    def test_headers_are_hidden_without_debug(self):
+        """Без DEBUG заголовков со статистикой нет."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn('X-Query-Count', response)
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 0})
+    def test_budget(self):
+        """Превышение бюджета в тестах роняет запрос, иначе пишется
+        в лог предупреждением."""
+        with self.assertRaises(QueryBudgetExceeded), \
+                self.assertLogs('core.queries', 'WARNING'):
+            self.guest_client.get(reverse('posts:index'))
+        cache.clear()
+        with override_settings(QUERY_BUDGET_RAISE=False), \
+                self.assertLogs('core.queries', 'WARNING'):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..slow_queries import SlowQueryLog
+
+
+User = get_user_model()
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.log_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.log_dir, ignore_errors=True)
+        self.path = os.path.join(self.log_dir, 'slow.log')
+        # Порог 0: в журнал попадает каждый запрос.
+        self.log = SlowQueryLog(
+            self.path, threshold_ms=0, max_bytes=2000, backups=1
+        )
+        self.addCleanup(self.log.close)
+
+    def entries(self):
+        self.log.flush()
+        with open(self.path, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_entry_has_params_and_plan(self):
+        """Запись содержит SQL, параметры, источник и план запроса."""
+        with connection.execute_wrapper(self.log):
+            User.objects.filter(username='TestUser').exists()
+        entry = self.entries()[-1]
+        self.assertIn('auth_user', entry['sql'])
+        self.assertEqual(entry['params'], ["'TestUser'"])
+        self.assertTrue(entry['origin'])
+        self.assertRegex(entry['plan'][0], r'^(SEARCH|SCAN) auth_user')
+
+    def test_origin_is_view(self):
+        """Запросы страницы относятся к её view."""
+        with connection.execute_wrapper(self.log):
+            self.guest_client.get(reverse('posts:index'))
+        self.assertIn(
+            'posts.views.index',
+            {entry['origin'] for entry in self.entries()},
+        )
+
+    def test_fast_queries_are_skipped(self):
+        """Запросы быстрее порога не пишутся."""
+        self.log.threshold = 60
+        with connection.execute_wrapper(self.log):
+            User.objects.exists()
+        self.assertEqual(self.entries(), [])
+
+    def test_log_is_rotated(self):
+        """Файл журнала ротируется по размеру."""
+        with connection.execute_wrapper(self.log):
+            for _ in range(20):
+                User.objects.filter(username='x' * 100).exists()
+        self.log.flush()
+        self.assertTrue(os.path.exists(self.path + '.1'))
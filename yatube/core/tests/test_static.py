@@ -0,0 +1,83 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    STATIC_ROOT=TEMP_STATIC_ROOT,
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder',
+    ],
+)
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def static_url(self, name):
+        return Template(
+            '{% load static %}{% static name %}'
+        ).render(Context({'name': name}))
+
+    def test_static_tag_uses_hashed_names(self):
+        """{% static %} подставляет имя с хэшем содержимого."""
+        url = self.static_url('css/bootstrap.min.css')
+        self.assertRegex(
+            url, r'^/static/css/bootstrap\.min\.[0-9a-f]{12}\.css$'
+        )
+
+    def test_collectstatic_writes_gzip_copies(self):
+        """collectstatic кладёт рядом с CSS сжатую копию."""
+        name = staticfiles_storage.stored_name('css/bootstrap.min.css')
+        path = os.path.join(TEMP_STATIC_ROOT, name)
+        with open(path, 'rb') as file, gzip.open(f'{path}.gz') as gz:
+            self.assertEqual(gz.read(), file.read())
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        """Файл с хэшем отдаётся сжатым и кэшируется навсегда."""
+        url = self.static_url('css/bootstrap.min.css')
+        response = self.guest_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        plain = self.guest_client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+
+    def test_bare_name_is_revalidated(self):
+        """Файл без хэша в имени браузер перепроверяет."""
+        response = self.guest_client.get('/static/css/bootstrap.min.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+class StaticWithoutManifestTest(TestCase):
+    @override_settings(STATIC_ROOT=os.path.join(TEMP_STATIC_ROOT, 'empty'))
+    def test_falls_back_to_bare_names(self):
+        """Без манифеста {% static %} отдаёт исходные имена."""
+        self.assertEqual(
+            Template("{% load static %}{% static 'img/logo.png' %}").render(
+                Context()
+            ),
+            '/static/img/logo.png',
+        )
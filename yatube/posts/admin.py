@@ -10,6 +10,14 @@ class PostAdmin(admin.ModelAdmin):
         'created',
         'author',
         'group',
+        'comments_count',
+        'image_format',
+    )
+    readonly_fields = (
+        'image_width',
+        'image_height',
+        'image_size',
+        'image_format',
     )
     search_fields = ('text',)
     list_filter = ('created',)
@@ -18,7 +26,7 @@ class PostAdmin(admin.ModelAdmin):
 
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('title', )
+    list_display = ('title', 'posts_count')
 
 
 class CommentAdmin(admin.ModelAdmin):
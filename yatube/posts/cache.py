@@ -0,0 +1,239 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Q, Subquery, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from django.utils.timezone import utc
+from django.views.decorators.http import condition
+
+from .models import PageStamp, Post
+
+
+INDEX_PAGES = 'index'
+GROUPS = 'groups'
+
+# Время изменения наборов страниц, которых ещё нет в PageStamp. Набор
+# GROUPS, от которого зависят все страницы, миграция создаёт сразу.
+EPOCH = datetime(2000, 1, 1, tzinfo=utc)
+
+# Ленты, в которых выводится карточка поста posts/includes/post_card.html.
+CARD_VIEWS = ('index', 'group_list', 'profile')
+
+PAGE_CACHE_HITS = 'posts:page-cache:hits'
+PAGE_CACHE_MISSES = 'posts:page-cache:misses'
+
+
+def feed_count_key(scope):
+    """Ключ кэша с количеством постов в ленте: 'all', 'group:<id>'
+    или 'author:<id>'."""
+    return f'posts:count:{scope}'
+
+
+def feed_scopes(group_ids=(), author_ids=(), include_all=True):
+    """Ленты, в которых показывается пост с такими группами и авторами."""
+    scopes = ['all'] if include_all else []
+    scopes += [f'group:{pk}' for pk in group_ids if pk is not None]
+    scopes += [f'author:{pk}' for pk in author_ids if pk is not None]
+    return scopes
+
+
+def invalidate_feed_counts(scopes):
+    cache.delete_many([feed_count_key(scope) for scope in scopes])
+
+
+def card_cache_key(post_id, view_name, is_author):
+    return f'posts:card:{post_id}:{view_name}:{int(is_author)}'
+
+
+def invalidate_post_cards(post_id):
+    cache.delete_many([
+        card_cache_key(post_id, view_name, is_author)
+        for view_name in CARD_VIEWS
+        for is_author in (False, True)
+    ])
+
+
+def group_pages(slug):
+    return f'group:{slug}'
+
+
+def author_pages(username):
+    return f'author:{username}'
+
+
+def post_pages(post_id):
+    return f'post:{post_id}'
+
+
+def post_detail_scopes(post_id):
+    """На странице поста выводится число постов автора, поэтому она
+    зависит и от набора страниц автора. Его имя page_stamps находит
+    подзапросом, в том же запросе, что и отметки."""
+    username = Post.objects.filter(pk=post_id).values('author__username')
+    return [
+        post_pages(post_id),
+        GROUPS,
+        Concat(
+            Value(author_pages('')), Subquery(username[:1]),
+            output_field=models.CharField(),
+        ),
+    ]
+
+
+def page_stamps(scopes):
+    """Время последнего изменения наборов страниц из PageStamp одним
+    запросом: словарь набор -> время. Набор может быть и выражением,
+    вычисляющим имя набора в базе. Наборов, которые ещё не менялись,
+    в словаре нет: на чтении отметки не создаются, иначе любой запрос
+    к несуществующей странице писал бы в базу."""
+    condition = Q(scope__in=[s for s in scopes if isinstance(s, str)])
+    for scope in scopes:
+        if not isinstance(scope, str):
+            condition |= Q(scope=scope)
+    return dict(
+        PageStamp.objects.filter(condition).values_list('scope', 'modified')
+    )
+
+
+def touch_pages(scopes):
+    """Помечает наборы страниц изменёнными; только здесь отметки
+    и создаются. Ключи закэшированных
+    страниц и ETag содержат отметки, поэтому старые копии просто
+    перестают находиться и вытесняются по таймауту. Вызывается
+    в транзакции изменения: до её фиксации другие процессы видят
+    прежнюю отметку вместе с прежними данными."""
+    scopes = set(scopes)
+    now = timezone.now()
+    existing = set(
+        PageStamp.objects.filter(scope__in=scopes)
+        .values_list('scope', flat=True)
+    )
+    PageStamp.objects.filter(scope__in=existing).update(modified=now)
+    PageStamp.objects.bulk_create(
+        [PageStamp(scope=scope, modified=now) for scope in scopes - existing],
+        ignore_conflicts=True,
+    )
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def page_cache_stats():
+    return {
+        'hits': cache.get(PAGE_CACHE_HITS, 0),
+        'misses': cache.get(PAGE_CACHE_MISSES, 0),
+    }
+
+
+def page_cache_metrics():
+    """Попадания в кэш страниц для страницы метрик. Счётчики лежат
+    в общем кэше, поэтому уже сложены по всем процессам."""
+    stats = page_cache_stats()
+    return [
+        ('yatube_page_cache_hits_total', 'counter',
+         'Ответы анонимам из кэша страниц.', stats['hits']),
+        ('yatube_page_cache_misses_total', 'counter',
+         'Ответы анонимам, собранные заново.', stats['misses']),
+    ]
+
+
+def cache_for_anonymous(get_scopes):
+    """Кэширует целиком страницы для анонимных GET-запросов.
+
+    get_scopes получает именованные аргументы view и возвращает
+    наборы страниц, от которых зависит ответ; их изменение
+    (touch_pages) сбрасывает копию."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or _has_session(request):
+                return view(request, *args, **kwargs)
+            # Без cookie сессии пользователь точно аноним. Не обращаемся
+            # к сессии, чтобы не загружать её и не получить Vary: Cookie.
+            request.user = AnonymousUser()
+            stamps = _stamps(request, get_scopes, kwargs)
+            key = 'posts:page:' + hashlib.md5(
+                f'{request.get_full_path()}|{stamps}'.encode()
+            ).hexdigest()
+            response = cache.get(key)
+            if response is not None:
+                _count(PAGE_CACHE_HITS)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+            _count(PAGE_CACHE_MISSES)
+            response = view(request, *args, **kwargs)
+            if (response.status_code == 200
+                    and not response.streaming
+                    and not request.META.get('CSRF_COOKIE_USED')):
+                cache.set(
+                    key, response, settings.POSTS_PAGE_CACHE_TIMEOUT
+                )
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _has_session(request):
+    return settings.SESSION_COOKIE_NAME in request.COOKIES
+
+
+def _stamps(request, get_scopes, kwargs):
+    """Отметки страницы читаются один раз на запрос: их используют
+    и валидаторы, и кэш страниц."""
+    if not hasattr(request, '_page_stamps'):
+        request._page_stamps = sorted(
+            page_stamps(get_scopes(**kwargs)).items()
+        )
+    return request._page_stamps
+
+
+def page_validators(get_scopes):
+    """ETag и Last-Modified страницы по отметкам её наборов страниц
+    в базе (PageStamp), которые обновляются при любом изменении
+    постов, комментариев, групп и счётчиков. Совпавший валидатор
+    даёт 304 после одного запроса к базе, без рендера шаблона
+    и без записи в базу.
+
+    В ETag входят также пользователь и cookie CSRF: от них зависят
+    кнопки и формы на странице. Last-Modified их не учитывает, поэтому
+    выдаётся только анонимам."""
+    def etag(request, *args, **kwargs):
+        # Без cookie сессии не трогаем request.user, как и в
+        # cache_for_anonymous: иначе в ответ попадёт Vary: Cookie.
+        user = request.user.pk if _has_session(request) else None
+        csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        stamps = _stamps(request, get_scopes, kwargs)
+        return hashlib.md5(
+            f'{request.get_full_path()}|{stamps}|{user}|{csrf}'.encode()
+        ).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if _has_session(request):
+            return None
+        return max(
+            (modified for _, modified in _stamps(request, get_scopes, kwargs)),
+            default=EPOCH,
+        )
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def cached_page(get_scopes):
+    """Условный GET по page_validators и кэш страниц для анонимов."""
+    def decorator(view):
+        return page_validators(get_scopes)(
+            cache_for_anonymous(get_scopes)(view)
+        )
+    return decorator
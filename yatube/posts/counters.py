@@ -0,0 +1,92 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Group, Post, User
+
+
+def _shift(queryset, field, delta):
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def change_group_posts(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_author_posts(user_id, delta):
+    if delta > 0:
+        # При удалении пользователя его статистика удаляется каскадом
+        # раньше постов, создавать её заново нельзя.
+        AuthorStats.objects.get_or_create(user_id=user_id)
+    _shift(AuthorStats.objects.filter(pk=user_id), 'posts_count', delta)
+
+
+def change_post_comments(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count_subquery(model, field):
+    """Подзапрос с настоящим количеством строк model на объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def _fix(queryset, field, actual, batch_size):
+    """Перезаписывает счётчик field у строк, где он разошёлся
+    с actual. Возвращает число исправленных строк."""
+    model = queryset.model
+    drifted = (
+        queryset.annotate(actual=actual)
+        .exclude(**{field: F('actual')})
+        .values_list('pk', 'actual')
+    )
+    total = 0
+    batch = []
+    # Разошедшихся строк обычно мало, а обновлять таблицу, пока по
+    # ней идёт курсор SQLite, нельзя, поэтому сначала читаем всё.
+    for pk, value in list(drifted):
+        batch.append(model(pk=pk, **{field: value}))
+        if len(batch) == batch_size:
+            model.objects.bulk_update(batch, [field])
+            total += len(batch)
+            batch = []
+    model.objects.bulk_update(batch, [field])
+    return total + len(batch)
+
+
+def recount(batch_size=1000):
+    """Пересчитывает все счётчики. Возвращает словарь с числом
+    исправленных строк по каждому счётчику."""
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(user_id=pk) for pk in
+            User.objects.filter(stats=None).values_list('pk', flat=True)
+        ],
+        # Размер пачки выбирает Django: SQLite вставляет не больше
+        # 500 строк одним запросом.
+    )
+    return {
+        'group posts': _fix(
+            Group.objects.all(),
+            'posts_count',
+            _count_subquery(Post, 'group'),
+            batch_size,
+        ),
+        'author posts': _fix(
+            AuthorStats.objects.all(),
+            'posts_count',
+            _count_subquery(Post, 'author'),
+            batch_size,
+        ),
+        'post comments': _fix(
+            Post.objects.all(),
+            'comments_count',
+            _count_subquery(Comment, 'post'),
+            batch_size,
+        ),
+    }
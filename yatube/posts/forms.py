@@ -1,12 +1,70 @@
+import warnings
+
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import Image
 
 from .models import Post, Comment
 
 
+class PostImageField(forms.ImageField):
+    """Проверяет картинку по заголовку, не декодируя её целиком:
+    формат, число пикселей и обрезанную при загрузке передачу."""
+    default_error_messages = {
+        **forms.ImageField.default_error_messages,
+        'too_large': 'Файл больше %(size)s МБ.',
+        'too_many_pixels': 'В картинке больше %(pixels)s пикселей.',
+    }
+
+    def to_python(self, data):
+        file = forms.FileField.to_python(self, data)
+        if file is None:
+            return None
+        if getattr(file, 'truncated', False):
+            raise ValidationError(
+                self.error_messages['too_large'],
+                code='too_large',
+                params={
+                    'size': settings.POST_IMAGE_MAX_UPLOAD_SIZE // 2 ** 20
+                },
+            )
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter(
+                    'ignore', Image.DecompressionBombWarning
+                )
+                image = Image.open(file)
+        except Exception as error:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            ) from error
+        width, height = image.size
+        if (image.format not in settings.POST_IMAGE_FORMATS
+                or not width or not height):
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            )
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'pixels': settings.POST_IMAGE_MAX_PIXELS},
+            )
+        file.image = image
+        file.content_type = Image.MIME.get(image.format)
+        if hasattr(file, 'seek') and callable(file.seek):
+            file.seek(0)
+        return file
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = {'text', 'group', 'image'}
+        field_classes = {'image': PostImageField}
     field_order = {
         'text',
         'group',
@@ -0,0 +1,47 @@
+import base64
+import io
+
+from django.conf import settings
+from PIL import Image
+
+
+def image_metadata(file):
+    """Размеры, вес и формат картинки. Pillow читает только
+    заголовок файла, не декодируя саму картинку."""
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = image.format or ''
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': file.size,
+        'image_format': image_format,
+    }
+
+
+def empty_image_metadata():
+    return {
+        'image_width': None,
+        'image_height': None,
+        'image_size': None,
+        'image_format': '',
+    }
+
+
+def image_preview(file):
+    """Крошечная копия картинки в виде data URI. Браузер растягивает
+    её с размытием, пока не загрузилась сама картинка."""
+    size = settings.POST_IMAGE_PREVIEW_SIZE
+    file.seek(0)
+    with Image.open(file) as image:
+        # Для JPEG Pillow декодирует сразу в уменьшенном масштабе.
+        image.draft('RGB', (size * 8, size * 8))
+        preview = image.convert('RGB')
+        preview.thumbnail((size, size))
+    buffer = io.BytesIO()
+    preview.save(buffer, 'JPEG', quality=60)
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
@@ -0,0 +1,23 @@
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """kvstore sorl, который умеет искать много записей сразу:
+    одним get_many из кэша и одним запросом к таблице."""
+    def get_many_raw(self, keys):
+        found = {
+            key: value
+            for key, value in self.cache.get_many(keys).items()
+            if isinstance(value, str)
+        }
+        missing = [key for key in keys if key not in found]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            self.cache.set_many(stored, settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(stored)
+        return found
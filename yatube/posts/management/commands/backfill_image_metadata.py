@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from posts.images import image_metadata, image_preview
+from posts.models import Post
+
+
+FIELDS = [
+    'image_width', 'image_height', 'image_size', 'image_format',
+    'image_placeholder',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Записывает размеры, вес, формат и заглушки картинок постов, '
+        'загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов обновлять одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        posts = Post.objects.exclude(image='').filter(
+            Q(image_width__isnull=True)
+            | Q(image_height__isnull=True)
+            | Q(image_size__isnull=True)
+            | Q(image_format='')
+            | Q(image_placeholder='')
+        ).order_by('pk')
+        last_pk = 0
+        filled = missing = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)
+                .values_list('pk', 'image')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            updated = []
+            for pk, name in batch:
+                try:
+                    with storage.open(name) as file:
+                        metadata = image_metadata(file)
+                        metadata['image_placeholder'] = image_preview(file)
+                except (OSError, ValueError) as error:
+                    missing += 1
+                    self.stderr.write(f'Пост {pk}, {name}: {error}')
+                    continue
+                updated.append(
+                    Post(pk=pk, modified=timezone.now(), **metadata)
+                )
+            # modified обновляется, чтобы перерисовались карточки постов.
+            Post.objects.bulk_update(updated, FIELDS + ['modified'])
+            filled += len(updated)
+        self.stdout.write(f'Заполнено постов: {filled}')
+        if missing:
+            self.stdout.write(f'Не удалось прочитать картинок: {missing}')
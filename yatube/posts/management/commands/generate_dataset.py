@@ -0,0 +1,308 @@
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from posts.cache import (GROUPS, feed_scopes, invalidate_feed_counts,
+                         touch_pages)
+from posts.counters import recount
+from posts.images import image_metadata
+from posts.models import Comment, Group, Post, User
+
+
+WORDS = (
+    'время жизнь день рука раз работа слово место лицо друг глаз вопрос '
+    'дом сторона страна мир случай голова ребёнок сила конец вид система '
+    'часть город отношение женщина деньги земля машина вода отец проблема '
+    'час право нога решение дверь образ история власть закон война бог '
+    'голос тысяча книга возможность результат ночь стол имя область статья'
+).split()
+
+# Сколько разных картинок делить между постами с картинками.
+IMAGES = 20
+
+
+def skewed(rng, size, skew):
+    """Случайный индекс от 0 до size - 1, тем чаще, чем он меньше:
+    при skew > 1 немногие первые объекты получают большую часть
+    выборок, как популярные авторы и группы."""
+    return min(int(size * rng.random() ** skew), size - 1)
+
+
+def parse_now(value):
+    """Момент, от которого отсчитываются даты: ГГГГ-ММ-ДД
+    или ГГГГ-ММ-ДДTЧЧ:ММ[:СС]."""
+    try:
+        moment = parse_datetime(value) or datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise CommandError(f'Неверная дата --now: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Даёт bulk_create записать свои даты в поля auto_now и
+    auto_now_add, а не текущее время."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами '
+        'и комментариями для проверки лент, паджинатора и админки на '
+        'больших объёмах. С теми же --seed и --now данные те же. '
+        'Немногие авторы пишут большую часть постов, немногие группы '
+        'собирают большую часть постов, у свежих постов длинные ветки '
+        'комментариев. После вставки пересчитывает счётчики и сбрасывает '
+        'кэш лент и страниц.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=300_000)
+        parser.add_argument(
+            '--image-share',
+            type=float,
+            default=0.1,
+            help='Доля постов с картинкой, от 0 до 1.',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько дней до --now распределить посты.',
+        )
+        parser.add_argument(
+            '--now',
+            help='Дата последних постов и комментариев, ГГГГ-ММ-ДД или '
+                 'ГГГГ-ММ-ДДTЧЧ:ММ. По умолчанию текущее время.',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=3.0,
+            help='Перекос популярности, 1 - равномерно.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix',
+            default='gen',
+            help='Начало имён пользователей и адресов групп.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько строк вставлять одной транзакцией.',
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['image_share'] <= 1:
+            raise CommandError('--image-share должна быть от 0 до 1.')
+        if (options['posts'] or options['comments']) and not options['users']:
+            raise CommandError('Постам и комментариям нужны авторы.')
+        now = parse_now(options['now']) if options['now'] else timezone.now()
+        # Созданные строки выбираются обратно по префиксу, поэтому
+        # с ним не должно быть чужих пользователей и групп.
+        prefix = options['prefix']
+        taken = (
+            User.objects.filter(username__startswith=prefix).exists()
+            or Group.objects.filter(
+                slug__startswith=f'{prefix}-group-'
+            ).exists()
+        )
+        if taken:
+            raise CommandError(
+                f'Пользователи или группы {prefix}... уже есть, '
+                f'задайте другой --prefix.'
+            )
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.now = now.replace(microsecond=0)
+        self.start = self.now - timedelta(days=options['days'])
+        users = self.create_users()
+        groups = self.create_groups()
+        posts = self.create_posts(users, groups)
+        self.create_comments(users, posts)
+        started = time.monotonic()
+        with transaction.atomic():
+            recount(batch_size=options['batch_size'])
+            # Счётчики лент в кэше и отметки страниц не знают о новых
+            # строках: bulk_create не посылает сигналов. Остальной
+            # общий кэш не трогаем.
+            invalidate_feed_counts(
+                feed_scopes(group_ids=groups, author_ids=users)
+            )
+            touch_pages([GROUPS])
+        self.stdout.write(
+            f'Счётчики пересчитаны за {time.monotonic() - started:.1f} с'
+        )
+
+    def insert(self, label, model, rows, total, inserted=None):
+        """Вставляет строки пачками, каждую в своей транзакции.
+        bulk_create в SQLite не сообщает первичные ключи, и они не
+        обязательно идут подряд, поэтому новые строки выбираются
+        обратно запросом inserted. Возвращает их ключи по порядку
+        вставки, если inserted задан."""
+        batch_size = self.options['batch_size']
+        started = time.monotonic()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                batch = []
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{label}: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        )
+        if inserted is not None:
+            return list(
+                inserted.order_by('pk').values_list('pk', flat=True)
+            )
+
+    def text(self, low, high):
+        length = low + skewed(self.rng, high - low + 1, 2)
+        return ' '.join(self.rng.choices(WORDS, k=length)).capitalize()
+
+    def create_users(self):
+        prefix = self.options['prefix']
+        password = UNUSABLE_PASSWORD_PREFIX + 'generated'
+        rows = (
+            User(
+                username=f'{prefix}{n}',
+                first_name=self.rng.choice(WORDS).capitalize(),
+                last_name=self.rng.choice(WORDS).capitalize(),
+                password=password,
+                date_joined=self.start,
+            )
+            for n in range(self.options['users'])
+        )
+        return self.insert(
+            'Пользователи', User, rows, self.options['users'],
+            User.objects.filter(username__startswith=prefix),
+        )
+
+    def create_groups(self):
+        prefix = self.options['prefix']
+        rows = (
+            Group(
+                title=self.text(1, 3),
+                slug=f'{prefix}-group-{n}',
+                description=self.text(5, 30),
+            )
+            for n in range(self.options['groups'])
+        )
+        return self.insert(
+            'Группы', Group, rows, self.options['groups'],
+            Group.objects.filter(slug__startswith=f'{prefix}-group-'),
+        )
+
+    def create_images(self):
+        """Несколько настоящих картинок, которые делят посты."""
+        storage = Post._meta.get_field('image').storage
+        images = []
+        for n in range(IMAGES):
+            size = (self.rng.randint(320, 1920), self.rng.randint(240, 1080))
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', size, color).save(buffer, 'JPEG')
+            content = ContentFile(buffer.getvalue())
+            name = storage.save(f'posts/generated-{n}.jpg', content)
+            images.append((name, image_metadata(content)))
+        return images
+
+    def post_created(self, index):
+        """Дата поста index: посты идут по времени в порядке ключей."""
+        step = (self.now - self.start) / max(self.options['posts'], 1)
+        return self.start + step * index
+
+    def create_posts(self, users, groups):
+        options = self.options
+        images = self.create_images() if options['image_share'] else []
+        fields = [
+            Post._meta.get_field('created'), Post._meta.get_field('modified')
+        ]
+
+        def rows():
+            for index in range(options['posts']):
+                created = self.post_created(index)
+                values = {}
+                # Треть постов без группы.
+                if groups and self.rng.random() > 1 / 3:
+                    values['group_id'] = groups[skewed(
+                        self.rng, len(groups), options['skew']
+                    )]
+                if images and self.rng.random() < options['image_share']:
+                    # Метаданные картинки берутся из уже сгенерированных
+                    # файлов, а не читаются заново для каждого поста.
+                    name, metadata = self.rng.choice(images)
+                    values.update(image=name, **metadata)
+                post = Post(
+                    text=self.text(5, 200),
+                    author_id=users[skewed(
+                        self.rng, len(users), options['skew']
+                    )],
+                    created=created,
+                    modified=created,
+                    **values,
+                )
+                yield post
+
+        with explicit_dates(*fields):
+            return self.insert(
+                'Посты', Post, rows(), options['posts'],
+                Post.objects.filter(
+                    author__username__startswith=options['prefix']
+                ),
+            )
+
+    def create_comments(self, users, posts):
+        options = self.options
+        if not posts:
+            return
+
+        def rows():
+            for _ in range(options['comments']):
+                # Чем новее пост, тем длиннее у него ветка.
+                index = len(posts) - 1 - skewed(
+                    self.rng, len(posts), options['skew']
+                )
+                since = self.post_created(index + 1)
+                yield Comment(
+                    post_id=posts[index],
+                    author_id=users[skewed(
+                        self.rng, len(users), options['skew']
+                    )],
+                    text=self.text(1, 60),
+                    created=since + (self.now - since) * self.rng.random(),
+                )
+
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.insert(
+                'Комментарии', Comment, rows(), options['comments']
+            )
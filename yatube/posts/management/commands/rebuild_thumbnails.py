@@ -0,0 +1,240 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as day_time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from sorl.thumbnail.images import ImageFile
+
+from posts.cache import GROUPS, touch_pages
+from posts.models import Post, User
+from posts.tasks import setup_process
+from posts.thumbnails import make_thumbnails
+
+
+def _rebuild(pk, name, force):
+    """Возвращает (pk, None) или (pk, текст ошибки): одна битая
+    или пропавшая картинка не должна останавливать весь запуск."""
+    # Без хранилища поля image sorl искал бы файл в default_storage.
+    storage = Post._meta.get_field('image').storage
+    try:
+        make_thumbnails(ImageFile(name, storage), force=force)
+    except Exception as error:
+        return pk, f'{type(error).__name__}: {error}'
+    return pk, None
+
+
+# Настройки, которые процесс пула берёт у родителя, а не из модуля
+# настроек: их могли поменять на лету (override_settings в тестах).
+WORKER_SETTINGS = ('DATABASES', 'CACHES', 'MEDIA_ROOT')
+
+
+def _stream(queryset, last_pk, chunk_size):
+    """Выдаёт (pk, image) пачками по pk. В отличие от iterator()
+    не держит открытым курсор SQLite: пока он открыт, процессы пула
+    не смогли бы записать миниатюры в kvstore."""
+    while True:
+        chunk = list(
+            queryset.filter(pk__gt=last_pk)
+            .values_list('pk', 'image')[:chunk_size]
+        )
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1][0]
+
+
+def _parse_day(value, end_of_day=False):
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Дата должна быть в формате ГГГГ-ММ-ДД: {value}')
+    return timezone.make_aware(
+        datetime.combine(day, day_time.max if end_of_day else day_time.min)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново создаёт миниатюры всех размеров из settings.POST_THUMBNAILS '
+        'для картинок постов в пуле процессов. Прерванный запуск '
+        'продолжается с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов. 0 - работать в текущем процессе.',
+        )
+        parser.add_argument(
+            '--author', action='append', default=[],
+            help='Только посты этого автора (можно повторять).',
+        )
+        parser.add_argument('--since', help='Посты с этой даты, ГГГГ-ММ-ДД.')
+        parser.add_argument('--until', help='Посты до этой даты включительно.')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Удалить старые миниатюры перед созданием новых.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, '.rebuild_thumbnails'),
+            help='Файл с позицией для продолжения после прерывания.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не глядя на сохранённую позицию.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--report-every', type=int, default=100,
+            help='Как часто печатать прогресс и сохранять позицию.',
+        )
+
+    def get_queryset(self, options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if options['author']:
+            authors = User.objects.filter(username__in=options['author'])
+            if len(authors) != len(set(options['author'])):
+                raise CommandError('Не все авторы найдены.')
+            posts = posts.filter(author__in=authors)
+        if options['since']:
+            posts = posts.filter(created__gte=_parse_day(options['since']))
+        if options['until']:
+            posts = posts.filter(
+                created__lte=_parse_day(options['until'], end_of_day=True)
+            )
+        return posts
+
+    def load_checkpoint(self, path, filters):
+        """Последний обработанный pk, если позиция сохранена
+        для тех же фильтров."""
+        if not os.path.exists(path):
+            return 0
+        with open(path) as checkpoint:
+            state = json.load(checkpoint)
+        if state.get('filters') != filters:
+            raise CommandError(
+                f'Позиция в {path} сохранена для других фильтров: '
+                f'{state.get("filters")}. Запустите с --restart.'
+            )
+        return state['last_pk']
+
+    def save_checkpoint(self, path, filters, last_pk):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as checkpoint:
+            json.dump({'filters': filters, 'last_pk': last_pk}, checkpoint)
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        filters = {
+            key: options[key] for key in ('author', 'since', 'until', 'force')
+        }
+        path = options['checkpoint']
+        last_pk = 0
+        if not options['restart']:
+            last_pk = self.load_checkpoint(path, filters)
+            if last_pk:
+                self.stdout.write(f'Продолжаем после поста {last_pk}')
+        images = _stream(
+            self.get_queryset(options), last_pk, options['chunk_size']
+        )
+        done = 0
+        rebuilt = []
+        failed = []
+        started = time.monotonic()
+
+        def progress(result):
+            nonlocal done, last_pk
+            pk, error = result
+            done += 1
+            last_pk = pk
+            if error is None:
+                rebuilt.append(pk)
+            else:
+                failed.append(pk)
+                self.stderr.write(f'Пост {pk}: {error}')
+            if done % options['report_every'] == 0:
+                self.refresh_pages(rebuilt)
+                self.save_checkpoint(path, filters, last_pk)
+                self.report(done, started)
+
+        finished = False
+        try:
+            self.process(images, options, progress)
+            finished = True
+        except KeyboardInterrupt:
+            self.stderr.write(
+                f'Прервано. Позиция сохранена в {path} (пост {last_pk}).'
+            )
+            raise SystemExit(1)
+        finally:
+            self.refresh_pages(rebuilt)
+            if finished:
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                self.save_checkpoint(path, filters, last_pk)
+        self.report(done, started)
+        if failed:
+            raise CommandError(
+                f'Не удалось обработать картинок: {len(failed)} '
+                f'(посты {", ".join(map(str, failed))}).'
+            )
+        self.stdout.write(self.style.SUCCESS('Готово.'))
+
+    def refresh_pages(self, rebuilt):
+        """Как и generate_post_thumbnails, обновляет modified постов
+        с новыми миниатюрами: от него зависят их карточки. update()
+        не шлёт сигналов, а страниц с этими постами много, поэтому
+        сбрасывается набор GROUPS, от которого зависят все страницы."""
+        if rebuilt:
+            Post.objects.filter(pk__in=rebuilt).update(
+                modified=timezone.now()
+            )
+            touch_pages([GROUPS])
+            rebuilt.clear()
+
+    def process(self, images, options, progress):
+        if options['workers'] == 0:
+            for pk, name in images:
+                progress(_rebuild(pk, name, options['force']))
+        else:
+            self.run_pool(images, options, progress)
+
+    def run_pool(self, images, options, progress):
+        """Держит в работе не больше workers * 4 картинок, чтобы не
+        выбирать весь queryset в память, и отмечает прогресс строго
+        по порядку pk: позиция всегда указывает на готовый префикс."""
+        window = options['workers'] * 4
+        in_flight = deque()
+        # spawn, а не fork: процессы не должны унаследовать открытое
+        # соединение с БД, по которому идёт выборка постов.
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=setup_process,
+            initargs=({
+                name: getattr(settings, name) for name in WORKER_SETTINGS
+            },),
+        ) as executor:
+            for pk, name in images:
+                in_flight.append(
+                    executor.submit(_rebuild, pk, name, options['force'])
+                )
+                if len(in_flight) >= window:
+                    progress(in_flight.popleft().result())
+            while in_flight:
+                progress(in_flight.popleft().result())
+
+    def report(self, done, started):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Обработано картинок: {done}, {rate:.1f} в секунду'
+        )
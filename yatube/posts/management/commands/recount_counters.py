@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов у групп и авторов '
+        'и счётчики комментариев у постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк обновлять одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount(batch_size=options['batch_size'])
+        for counter, rows in fixed.items():
+            self.stdout.write(f'{counter}: исправлено строк {rows}')
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.cache import GROUPS, touch_pages
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранилища с именами '
+        'по хэшу содержимого, и пачками переписывает поле image. '
+        'Старые миниатюры удаляет manage.py thumbnail cleanup, новые '
+        'создаются в фоне при первом показе. bulk_update не шлёт '
+        'сигналов, поэтому после каждой пачки сбрасываются отметки '
+        'всех страниц (GROUPS), как в rebuild_thumbnails.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов обновлять одним запросом.',
+        )
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            help='Не удалять файлы по старым адресам.',
+        )
+
+    def save_batch(self, storage, updated, old_names, options):
+        """Переписывает image пачки постов, сбрасывает отметки страниц
+        и удаляет старые файлы, на которые больше никто не ссылается."""
+        if not updated:
+            return
+        with transaction.atomic():
+            Post.objects.bulk_update(updated, ['image', 'modified'])
+        touch_pages([GROUPS])
+        if not options['keep_old']:
+            still_used = set(
+                Post.objects.filter(image__in=old_names)
+                .values_list('image', flat=True)
+            )
+            for name in set(old_names) - still_used:
+                storage.delete(name)
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', 'image', 'image_width', 'image_height'
+        )
+        last_pk = 0
+        moved = failed = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            updated = []
+            old_names = []
+            for pk, name, width, height in batch:
+                if storage.is_hashed(name):
+                    continue
+                try:
+                    with storage.open(name) as file:
+                        new_name = storage.save(name, file)
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(f'Пост {pk}, {name}: {error}')
+                    continue
+                updated.append(Post(
+                    pk=pk, image=new_name, image_width=width,
+                    image_height=height, modified=timezone.now(),
+                ))
+                old_names.append(name)
+            self.save_batch(storage, updated, old_names, options)
+            moved += len(updated)
+        self.stdout.write(f'Перенесено картинок: {moved}')
+        if failed:
+            self.stdout.write(f'Не удалось прочитать картинок: {failed}')
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.19 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_format',
+            field=models.CharField(blank=True, editable=False, max_length=10, verbose_name='формат картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='размер картинки в байтах'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='ширина картинки'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.19 on 2026-10-18 02:18
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Картинка поста', storage=posts.storage.HashedFileSystemStorage(), upload_to='posts/', verbose_name='картинка'),
+        ),
+    ]
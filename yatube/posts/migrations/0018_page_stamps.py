@@ -0,0 +1,35 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:00
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_groups_stamp(apps, schema_editor):
+    # От набора 'groups' (posts.cache.GROUPS) зависят все страницы:
+    # его отметка не даёт Last-Modified страниц уйти в прошлое, пока
+    # остальные наборы ещё не менялись.
+    PageStamp = apps.get_model('posts', 'PageStamp')
+    PageStamp.objects.create(scope='groups', modified=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageStamp',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=255, unique=True, verbose_name='набор страниц')),
+                ('modified', models.DateTimeField(verbose_name='дата изменения')),
+            ],
+            options={
+                'verbose_name': 'отметка страниц',
+                'verbose_name_plural': 'отметки страниц',
+            },
+        ),
+        migrations.RunPython(create_groups_stamp, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 from core.models import CreatedModel
 from django.conf import settings
 
+from .images import empty_image_metadata, image_metadata
+from .storage import post_image_storage
+
 
 User = get_user_model()
 
@@ -12,11 +15,34 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        verbose_name='количество постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self) -> str:
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Столбцы, которые выводит карточка поста (post_card.html)
+    # и от которых зависит её кэш.
+    FEED_FIELDS = (
+        'text', 'created', 'modified', 'comments_count',
+        'image', 'image_placeholder',
+        'author__username', 'author__first_name', 'author__last_name',
+        'group__slug',
+    )
+
+    def for_feed(self):
+        """Посты для лент: автор и группа в том же запросе, только
+        столбцы карточки."""
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS
+        )
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='текст поста',
@@ -42,15 +68,91 @@ class Post(CreatedModel):
         verbose_name='картинка',
         help_text='Картинка поста',
         upload_to='posts/',
+        storage=post_image_storage,
+        blank=True,
+    )
+    # Заполняются в save() и posts.uploads при загрузке картинки, чтобы
+    # не открывать файл ради её размеров. Для старых постов:
+    # manage.py backfill_image_metadata. width_field/height_field
+    # здесь не подходят: ImageField с ними открывает файл при каждой
+    # загрузке поста из базы, пока размеры не заполнены.
+    image_width = models.PositiveIntegerField(
+        verbose_name='ширина картинки',
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='высота картинки',
+        null=True,
+        editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        verbose_name='размер картинки в байтах',
+        null=True,
+        editable=False,
+    )
+    image_format = models.CharField(
+        verbose_name='формат картинки',
+        max_length=10,
+        blank=True,
+        editable=False,
+    )
+    # Считается в фоне после загрузки, см. posts.uploads.
+    image_placeholder = models.TextField(
+        verbose_name='заглушка картинки',
         blank=True,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='количество комментариев',
+        default=0,
+        editable=False,
+    )
+    modified = models.DateTimeField(
+        verbose_name='дата изменения',
+        auto_now=True,
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created']
+        # Ленты сортируются по (created, id), см. posts.utils.CursorPaginator.
+        # id указан явно: иначе SQLite досортировывает строки во
+        # временном B-дереве.
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'], name='post_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_feed_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:settings.POST_CHARS_VIEWED]
 
+    def set_image_metadata(self, metadata):
+        for field, value in metadata.items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        if not self.image:
+            self.set_image_metadata(empty_image_metadata())
+            self.image_placeholder = ''
+        elif not self.image._committed:
+            self.set_image_metadata(image_metadata(self.image))
+            self.image_placeholder = ''
+        # Счётчики обновляются в post_save, поэтому сохраняем
+        # пост и счётчики в одной транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -71,6 +173,57 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.POST_CHARS_VIEWED]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, которые дорого считать на каждый запрос."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='пользователь',
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='количество постов',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'статистика автора'
+        verbose_name_plural = 'статистика авторов'
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class PageStamp(models.Model):
+    """Время последнего изменения набора страниц (см. posts.cache).
+    Хранится в базе, а не в кэше: отметка меняется в той же
+    транзакции, что и данные, одинакова для всех процессов и не
+    теряется при очистке кэша."""
+    scope = models.CharField(
+        verbose_name='набор страниц',
+        max_length=255,
+        unique=True,
+    )
+    modified = models.DateTimeField(verbose_name='дата изменения')
+
+    class Meta:
+        verbose_name = 'отметка страниц'
+        verbose_name_plural = 'отметки страниц'
+
+    def __str__(self):
+        return f'{self.scope}: {self.modified}'
@@ -0,0 +1,135 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters
+from .cache import (GROUPS, INDEX_PAGES, author_pages, feed_scopes,
+                    group_pages, invalidate_feed_counts,
+                    invalidate_post_cards, post_pages, touch_pages)
+from .models import Comment, Group, Post, User
+
+
+def feed_pages(post, group_ids):
+    """Страницы, на которых виден пост: главная, лента автора,
+    ленты групп group_ids и сама страница поста."""
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk is not None]
+    ).values_list('slug', flat=True)
+    return [
+        INDEX_PAGES,
+        author_pages(post.author.username),
+        post_pages(post.pk),
+        *(group_pages(slug) for slug in slugs),
+    ]
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, raw, **kwargs):
+    """Запоминает группу поста до сохранения, чтобы при переносе
+    в другую группу обновить обе ленты."""
+    instance._previous_group_id = None
+    if instance.pk is not None and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def refresh_counts_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if created:
+        counters.change_group_posts(instance.group_id, 1)
+        counters.change_author_posts(instance.author_id, 1)
+        invalidate_feed_counts(feed_scopes(
+            group_ids=[instance.group_id], author_ids=[instance.author_id]
+        ))
+    elif previous_group_id != instance.group_id:
+        counters.change_group_posts(previous_group_id, -1)
+        counters.change_group_posts(instance.group_id, 1)
+        invalidate_feed_counts(feed_scopes(
+            group_ids=[previous_group_id, instance.group_id],
+            include_all=False,
+        ))
+    touch_pages(feed_pages(instance, [previous_group_id, instance.group_id]))
+    invalidate_post_cards(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def refresh_counts_on_delete(sender, instance, **kwargs):
+    counters.change_group_posts(instance.group_id, -1)
+    counters.change_author_posts(instance.author_id, -1)
+    invalidate_feed_counts(feed_scopes(
+        group_ids=[instance.group_id], author_ids=[instance.author_id]
+    ))
+    touch_pages(feed_pages(instance, [instance.group_id]))
+    invalidate_post_cards(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_post_comments(instance.post_id, 1)
+    # Количество комментариев показывается и в карточках лент.
+    touch_pages(feed_pages(instance.post, [instance.post.group_id]))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post_comments(instance.post_id, -1)
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        touch_pages(feed_pages(post, [post.group_id]))
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_slug(sender, instance, raw, **kwargs):
+    instance._previous_slug = None
+    if instance.pk is not None and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def refresh_group_pages(sender, instance, raw, **kwargs):
+    # Название и адрес группы выводятся на всех страницах с её постами,
+    # поэтому вместе со страницами группы сбрасываем набор GROUPS.
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    touch_pages([GROUPS, *(group_pages(slug) for slug in slugs if slug)])
+
+
+@receiver(post_delete, sender=Group)
+def refresh_deleted_group_pages(sender, instance, **kwargs):
+    touch_pages([GROUPS, group_pages(instance.slug)])
+
+
+AUTHOR_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_name(sender, instance, raw, update_fields, **kwargs):
+    # При входе сохраняется только last_login: имя не менялось,
+    # лишний запрос не нужен.
+    instance._previous_name = None
+    if (instance.pk is None or raw or update_fields is not None
+            and not set(update_fields) & set(AUTHOR_NAME_FIELDS)):
+        return
+    instance._previous_name = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def refresh_author_pages(sender, instance, created, raw, **kwargs):
+    # Имя автора выводится в карточках на всех лентах и страницах его
+    # постов, поэтому сбрасываем набор GROUPS, от которого зависят
+    # все страницы. Сами карточки учитывают имя в card_stamp.
+    previous = getattr(instance, '_previous_name', None)
+    if previous is None or previous == tuple(
+        getattr(instance, field) for field in AUTHOR_NAME_FIELDS
+    ):
+        return
+    touch_pages([GROUPS, author_pages(previous[0])])
@@ -0,0 +1,45 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+HASHED_NAME = re.compile(r'(?:[0-9a-f]{2}/){2}[0-9a-f]{64}(?:\.\w+)?$')
+
+
+@deconstructible
+class HashedFileSystemStorage(FileSystemStorage):
+    """Называет файлы по sha256 содержимого и раскладывает их по
+    вложенным каталогам: posts/ab/cd/abcd....gif. Одинаковые файлы
+    хранятся один раз, поэтому файл нельзя удалять, пока на него
+    ссылается хотя бы одна запись."""
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def is_hashed(self, name):
+        return HASHED_NAME.search(name) is not None
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+
+post_image_storage = HashedFileSystemStorage()
@@ -0,0 +1,48 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='posts-background',
+        )
+    return _executor
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        # У каждого потока пула свои соединения с БД.
+        connections.close_all()
+
+
+def run_in_background(func, *args):
+    """Выполняет func(*args) в пуле потоков после фиксации текущей
+    транзакции, чтобы задача увидела сохранённые данные."""
+    transaction.on_commit(
+        lambda: get_executor().submit(_run, func, *args)
+    )
+
+
+def setup_process(overrides):
+    """Инициализатор процессов пула, запущенных через spawn: настраивает
+    Django, подменив настройки overrides настройками родителя. Модуль
+    не импортирует моделей, поэтому загружается до django.setup()."""
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
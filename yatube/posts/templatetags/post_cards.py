@@ -0,0 +1,63 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.cache import card_cache_key
+from posts.thumbnails import prefetch_thumbnails
+
+
+register = template.Library()
+
+
+def card_stamp(post):
+    """Всё, от чего зависит карточка, кроме вида страницы и зрителя.
+    Имя автора и адрес группы тоже выводятся в карточке: после их
+    правки modified поста не меняется."""
+    return (
+        post.modified.timestamp(),
+        post.comments_count,
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group_id else None,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, show_group_link):
+    """Возвращает HTML карточек постов. Готовые карточки берутся
+    из кэша одним get_many, шаблон рендерится только для остальных."""
+    request = context['request']
+    view_name = request.resolver_match.url_name
+    posts = list(posts)
+    keys = {
+        post.pk: card_cache_key(
+            post.pk, view_name, post.author_id == request.user.pk
+        )
+        for post in posts
+    }
+    cached = cache.get_many(keys.values())
+    stale = [
+        post for post in posts
+        if cached.get(keys[post.pk], (None, None))[0] != card_stamp(post)
+    ]
+    # Миниатюры для всех карточек, которые придётся рендерить,
+    # ищутся одним запросом, а не отдельно в каждой карточке.
+    prefetch_thumbnails(stale, 'wide')
+    cards = []
+    rendered = {}
+    for post in posts:
+        key = keys[post.pk]
+        stamp, html = cached.get(key, (None, None))
+        if stamp != card_stamp(post):
+            html = render_to_string(
+                'posts/includes/post_card.html',
+                {'post': post, 'show_group_link': show_group_link},
+                request,
+            )
+            rendered[key] = (card_stamp(post), html)
+        cards.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
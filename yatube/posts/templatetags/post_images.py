@@ -0,0 +1,28 @@
+from django import template
+from django.urls import reverse
+
+from posts.thumbnails import ready_thumbnail
+from posts.variants import variant_token
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, alias):
+    """{% post_thumbnail post 'wide' as im %}: готовая миниатюра
+    или None. В отличие от {% thumbnail %} никогда не создаёт
+    миниатюру во время рендера."""
+    return ready_thumbnail(post, alias)
+
+
+@register.simple_tag
+def post_image_url(post, width, height, crop=True):
+    """Адрес копии картинки поста нужного размера. Копия создаётся
+    при первом запросе адреса, а не при рендере шаблона."""
+    if not post.image:
+        return ''
+    return reverse(
+        'posts:image_variant',
+        args=[variant_token(post.image.name, width, height, crop)],
+    )
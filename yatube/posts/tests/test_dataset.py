@@ -0,0 +1,106 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from ..management.commands.generate_dataset import parse_now
+from ..models import AuthorStats, Comment, Group, Post, User
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDatasetCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, **options):
+        options = {
+            'users': 20, 'groups': 5, 'posts': 300, 'comments': 600,
+            'image_share': 0.2, 'batch_size': 100, **options,
+        }
+        call_command('generate_dataset', stdout=StringIO(), **options)
+
+    def test_dataset(self):
+        """Команда создаёт заданное число строк, пересчитывает счётчики,
+        а даты комментариев не раньше дат их постов."""
+        self.generate()
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 600)
+        self.assertEqual(Group.objects.count(), 5)
+        with_images = Post.objects.exclude(image='').count()
+        self.assertTrue(30 <= with_images <= 90)
+        self.assertFalse(
+            Post.objects.exclude(image='').filter(image_width=None).exists()
+        )
+        for group in Group.objects.annotate(actual=Count('posts')):
+            self.assertEqual(group.posts_count, group.actual)
+        for post in Post.objects.annotate(actual=Count('comments')):
+            self.assertEqual(post.comments_count, post.actual)
+        self.assertEqual(AuthorStats.objects.count(), 20)
+        first, last = Post.objects.order_by('pk')[::299]
+        self.assertLess(first.created, last.created)
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__created')).exists()
+        )
+
+    def test_skew(self):
+        """Самый активный автор пишет намного больше среднего,
+        а у самого обсуждаемого поста длинная ветка."""
+        self.generate()
+        top_author = AuthorStats.objects.order_by('-posts_count').first()
+        self.assertGreater(top_author.posts_count, 300 / 20 * 3)
+        top_post = Post.objects.order_by('-comments_count').first()
+        self.assertGreater(top_post.comments_count, 600 / 300 * 10)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'created', 'modified', 'image',
+                'author__first_name', 'group__title',
+            )),
+            list(Comment.objects.order_by('pk').values_list(
+                'text', 'created', 'post__text',
+            )),
+        )
+
+    def test_same_seed_same_data(self):
+        """С теми же --seed и --now данные те же, включая даты."""
+        self.generate(prefix='first', now='2024-01-01T12:00')
+        first = self.snapshot()
+        Post.objects.all().delete()
+        self.generate(prefix='second', now='2024-01-01T12:00')
+        self.assertEqual(self.snapshot(), first)
+        now = parse_now('2024-01-01T12:00')
+        newest = Post.objects.order_by('-created')[0].created
+        self.assertTrue(now - timedelta(days=2) < newest <= now)
+
+    def test_rows_are_linked_to_generated_rows(self):
+        """Посты и комментарии ссылаются только на созданные командой
+        строки, даже если в базе уже есть другие."""
+        author = User.objects.create_user(username='existing')
+        group = Group.objects.create(title='Группа', slug='existing')
+        Post.objects.create(text='Старый пост', author=author, group=group)
+        self.generate()
+        generated = Post.objects.exclude(author=author)
+        self.assertEqual(generated.count(), 300)
+        self.assertFalse(generated.filter(group=group).exists())
+        self.assertEqual(
+            Comment.objects.filter(post__author=author).count(), 0
+        )
+        self.assertEqual(Comment.objects.count(), 600)
+
+    def test_existing_prefix(self):
+        """Повторный запуск с тем же префиксом останавливается
+        до вставки."""
+        self.generate(posts=0, comments=0)
+        with self.assertRaises(CommandError):
+            self.generate(posts=0, comments=0)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -126,12 +127,13 @@ class PostFormTests(TestCase):
             data=form_data
         )
         self.assertEqual(posts_count + 1, Post.objects.count())
+        digest = hashlib.sha256(PostFormTests.small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
                 group=PostFormTests.group,
                 author=PostFormTests.author,
-                image='posts/small.gif',
+                image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif',
             )
         )
 
@@ -1,6 +1,14 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import StringIO
 
-from ..models import Group, Post, User
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -55,3 +63,154 @@ class PostModelTest(TestCase):
                     PostModelTest.post._meta.get_field(field).help_text,
                     expected_value
                 )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group_1 = Group.objects.create(
+            title='Первая тестовая группа',
+            slug='test-slug-1',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Вторая тестовая группа',
+            slug='test-slug-2',
+        )
+
+    def assertCounters(self, group_1, group_2, author):
+        self.group_1.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.group_1.posts_count, group_1)
+        self.assertEqual(self.group_2.posts_count, group_2)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).posts_count, author
+        )
+
+    def test_post_counters_follow_post_changes(self):
+        """Счётчики постов меняются при создании, переносе
+        в другую группу и удалении поста."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group_1
+        )
+        self.assertCounters(group_1=1, group_2=0, author=1)
+        post.group = self.group_2
+        post.save()
+        self.assertCounters(group_1=0, group_2=1, author=1)
+        post.delete()
+        self.assertCounters(group_1=0, group_2=0, author=0)
+
+    def test_comment_counter_follows_comments(self):
+        """Счётчик комментариев поста меняется вместе с комментариями."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_recount_command_fixes_drift(self):
+        """Команда recount_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group_1
+        )
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        Group.objects.update(posts_count=7)
+        AuthorStats.objects.all().delete()
+        Post.objects.update(comments_count=0)
+        call_command('recount_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertCounters(group_1=1, group_2=0, author=1)
+
+    def test_recount_creates_many_missing_stats(self):
+        """Статистика создаётся и для сотен авторов сразу: SQLite
+        вставляет не больше 500 строк одним запросом."""
+        User.objects.bulk_create(
+            User(username=f'bulk{i}') for i in range(600)
+        )
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(
+            AuthorStats.objects.count(), User.objects.count()
+        )
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def assertMetadata(self, post, width, height, size, image_format):
+        self.assertEqual(
+            (post.image_width, post.image_height,
+             post.image_size, post.image_format),
+            (width, height, size, image_format),
+        )
+
+    def test_metadata_is_saved_on_upload(self):
+        """Размеры, вес и формат записываются при загрузке картинки
+        и сбрасываются, когда картинку убирают."""
+        post = self.create_post()
+        post.refresh_from_db()
+        self.assertMetadata(post, 2, 1, len(SMALL_GIF), 'GIF')
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertMetadata(post, None, None, None, '')
+
+    def test_backfill_command_fills_metadata(self):
+        """Команда backfill_image_metadata заполняет поля старых постов."""
+        post = self.create_post()
+        Post.objects.update(
+            image_width=None, image_height=None,
+            image_size=None, image_format='', image_placeholder='',
+        )
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        post.refresh_from_db()
+        self.assertMetadata(post, 2, 1, len(SMALL_GIF), 'GIF')
+        self.assertTrue(post.image_placeholder.startswith('data:image/'))
+        self.assertIn('Заполнено постов: 1', out.getvalue())
+
+    def test_missing_file_without_metadata_does_not_break_pages(self):
+        """Пост, у которого пропал файл, а размеры ещё не заполнены,
+        загружается из базы без чтения файла, и лента открывается."""
+        post = self.create_post()
+        Post.objects.update(image_width=None, image_height=None)
+        post.image.storage.delete(post.image.name)
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,105 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@override_settings(POSTS_PAGE_CACHE_TIMEOUT=0)
+class QueryPlanTest(TestCase):
+    """Запросы лент и страницы поста должны идти по индексам:
+    без полного просмотра таблицы и без сортировки во временном
+    B-дереве."""
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+        )
+        Post.objects.bulk_create(
+            Post(
+                text=f'Текст тестового поста #{i}',
+                author=cls.author,
+                group=cls.group,
+            )
+            for i in range(15)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+
+    def capture_plans(self, url, data=None):
+        """Выполняет запрос и возвращает планы всех SELECT-запросов
+        к таблицам постов и комментариев."""
+        queries = []
+
+        def collect(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(collect):
+            self.guest_client.get(url, data)
+        plans = {}
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plans[sql] = [row[-1] for row in cursor.fetchall()]
+        return plans
+
+    def assertPlansUseIndexes(self, url, data=None):
+        plans = self.capture_plans(url, data)
+        self.assertTrue(plans, f'Нет запросов к постам на странице {url}')
+        for sql, plan in plans.items():
+            with self.subTest(url=url, data=data, sql=sql):
+                for line in plan:
+                    self.assertIsNone(
+                        FULL_SCAN.match(line),
+                        f'Полный просмотр таблицы: {plan}'
+                    )
+                    self.assertNotIn(
+                        TEMP_SORT, line, f'Сортировка без индекса: {plan}'
+                    )
+
+    def test_feeds_use_indexes(self):
+        """Первая, нумерованная и следующая по курсору страницы лент
+        читаются по индексам."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+        ]
+        for url in urls:
+            self.assertPlansUseIndexes(url)
+            self.assertPlansUseIndexes(url, {'page': 2})
+            page_obj = self.guest_client.get(url).context['page_obj']
+            self.assertPlansUseIndexes(url, {'cursor': page_obj.next_cursor})
+            next_page = self.guest_client.get(
+                url, {'cursor': page_obj.next_cursor}
+            ).context['page_obj']
+            self.assertPlansUseIndexes(
+                url, {'cursor': next_page.previous_cursor}
+            )
+
+    def test_post_detail_uses_indexes(self):
+        """Пост и его комментарии читаются по индексам."""
+        self.assertPlansUseIndexes(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..cache import GROUPS, page_stamps
+from ..models import Post, User
+from ..storage import post_image_storage
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
+HASHED_NAME = f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.other_author = User.objects.create_user(username='OtherUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, author, name):
+        return Post.objects.create(
+            text='Пост с картинкой',
+            author=author,
+            image=SimpleUploadedFile(
+                name=name, content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def test_identical_uploads_are_stored_once(self):
+        """Одинаковые картинки получают одно имя по хэшу содержимого
+        во вложенных каталогах и хранятся одним файлом."""
+        first = self.create_post(HashedStorageTest.author, 'first.GIF')
+        second = self.create_post(HashedStorageTest.other_author, 'copy.gif')
+        self.assertEqual(first.image.name, HASHED_NAME)
+        self.assertEqual(second.image.name, HASHED_NAME)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(HASHED_NAME)],
+        )
+
+    def test_relocate_command_moves_old_files(self):
+        """relocate_images переносит файлы из плоского каталога
+        и переписывает поле image, сбрасывая отметки страниц."""
+        old_name = 'posts/old.gif'
+        old_path = os.path.join(TEMP_MEDIA_ROOT, old_name)
+        os.makedirs(os.path.dirname(old_path), exist_ok=True)
+        with open(old_path, 'wb') as file:
+            file.write(SMALL_GIF)
+        post = self.create_post(HashedStorageTest.author, 'new.gif')
+        Post.objects.filter(pk=post.pk).update(image=old_name)
+        stamps = page_stamps([GROUPS])
+        modified = Post.objects.get(pk=post.pk).modified
+        out = StringIO()
+        call_command('relocate_images', stdout=out)
+        post.refresh_from_db()
+        self.assertNotEqual(page_stamps([GROUPS]), stamps)
+        self.assertGreater(post.modified, modified)
+        self.assertEqual(post.image.name, HASHED_NAME)
+        self.assertTrue(post_image_storage.exists(HASHED_NAME))
+        self.assertFalse(os.path.exists(old_path))
+        self.assertIn('Перенесено картинок: 1', out.getvalue())
+        call_command('relocate_images', stdout=out)
+        self.assertIn('Перенесено картинок: 0', out.getvalue())
+
+    def test_plain_content_is_hashed(self):
+        """Сохранение без загрузки через форму тоже даёт имя по хэшу."""
+        name = post_image_storage.save('posts/raw.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(name, HASHED_NAME)
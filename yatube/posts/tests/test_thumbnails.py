@@ -0,0 +1,395 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import warnings
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from ..cache import GROUPS, page_stamps
+from ..models import Post, User
+from ..thumbnails import (LRUCache, find_thumbnail, generate_post_thumbnails,
+                          make_thumbnails, thumbnail_cache)
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def unique_gif(number):
+    """Картинка с уникальным содержимым: одинаковые файлы хранилище
+    сохраняет один раз, и у них общие миниатюры."""
+    return SMALL_GIF + number.to_bytes(4, 'big')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BackgroundThumbnailTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        thumbnail_cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(BackgroundThumbnailTest.author)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def wide_thumbnail(self):
+        thumbnail_cache.clear()
+        return find_thumbnail(
+            Post.objects.get(pk=BackgroundThumbnailTest.post.pk), 'wide'
+        )
+
+    def test_page_does_not_create_thumbnail(self):
+        """Страница с новой картинкой показывает заглушку, не создаёт
+        миниатюру сама и ставит её создание в очередь."""
+        queued = len(connection.run_on_commit)
+        response = self.authorized_client.get(
+            BackgroundThumbnailTest.detail_url
+        )
+        self.assertTemplateUsed(
+            response, 'posts/includes/image_placeholder.html'
+        )
+        self.assertIsNone(self.wide_thumbnail())
+        self.assertEqual(len(connection.run_on_commit), queued + 1)
+
+    def test_generated_thumbnail_is_shown(self):
+        """После фоновой задачи страница показывает миниатюру."""
+        generate_post_thumbnails(BackgroundThumbnailTest.post.id)
+        thumbnail = self.wide_thumbnail()
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(default.storage.exists(thumbnail.name))
+        response = self.authorized_client.get(
+            BackgroundThumbnailTest.detail_url
+        )
+        self.assertContains(response, thumbnail.url)
+        self.assertContains(
+            response,
+            f'width="{thumbnail.width}" height="{thumbnail.height}"',
+        )
+        self.assertTemplateNotUsed(
+            response, 'posts/includes/image_placeholder.html'
+        )
+
+    def test_broken_image_is_not_queued_again(self):
+        """Миниатюры картинки, которую не удалось прочитать, страница
+        не ставит в очередь снова."""
+        broken = Post.objects.create(
+            text='Пост без файла',
+            author=BackgroundThumbnailTest.author,
+            image=SimpleUploadedFile(
+                name='broken.gif', content=unique_gif(200),
+                content_type='image/gif',
+            ),
+        )
+        broken.image.storage.delete(broken.image.name)
+        with self.assertRaises(OSError), \
+                self.assertLogs('sorl.thumbnail', 'ERROR'):
+            generate_post_thumbnails(broken.pk)
+        queued = len(connection.run_on_commit)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': broken.pk})
+        )
+        self.assertTemplateUsed(
+            response, 'posts/includes/image_placeholder.html'
+        )
+        self.assertEqual(len(connection.run_on_commit), queued)
+
+    def test_post_create_queues_thumbnails(self):
+        """Создание поста с картинкой ставит миниатюры в очередь."""
+        queued = len(connection.run_on_commit)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Новый пост',
+                'image': SimpleUploadedFile(
+                    name='new.gif', content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            },
+        )
+        self.assertEqual(len(connection.run_on_commit), queued + 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPrefetchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        thumbnail_cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ThumbnailPrefetchTest.author)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост #{i}',
+                author=cls.author,
+                image=SimpleUploadedFile(
+                    name=f'prefetch_{i}.gif',
+                    content=unique_gif(i),
+                    content_type='image/gif',
+                ),
+            )
+            for i in range(settings.POSTS_VIEWED)
+        ]
+        # Картинки с тем же содержимым были в других тестах: без очистки
+        # sorl нашёл бы их миниатюры в кэше и не записал бы их в базу.
+        cache.clear()
+        for post in cls.posts[::2]:
+            make_thumbnails(post.image)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def kvstore_queries(self, url):
+        queries = []
+
+        def collect(execute, sql, params, many, context):
+            if 'thumbnail_kvstore' in sql:
+                queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(collect):
+            self.authorized_client.get(url)
+        return queries
+
+    def test_feed_page_uses_one_kvstore_query(self):
+        """Миниатюры всех карточек страницы ищутся одним запросом."""
+        self.assertEqual(len(self.kvstore_queries(reverse('posts:index'))), 1)
+
+    def test_ready_thumbnails_are_kept_in_memory(self):
+        """Найденные миниатюры повторно берутся из памяти процесса:
+        в базу идут только посты, у которых миниатюр ещё нет."""
+        self.authorized_client.get(reverse('posts:index'))
+        cache.clear()
+        queries = self.kvstore_queries(reverse('posts:index'))
+        self.assertEqual(len(queries), 1)
+        for post in ThumbnailPrefetchTest.posts[1::2]:
+            make_thumbnails(post.image)
+        cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
+        cache.clear()
+        self.assertEqual(self.kvstore_queries(reverse('posts:index')), [])
+
+    def test_lru_cache_is_bounded(self):
+        """LRU-кэш вытесняет давно не читанные записи."""
+        lru = LRUCache(max_size=2)
+        lru.set_many({'a': 1, 'b': 2})
+        lru.get_many(['a'])
+        lru.set_many({'c': 3})
+        self.assertEqual(len(lru), 2)
+        self.assertEqual(lru.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RebuildThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.other_author = User.objects.create_user(username='OtherUser')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост #{i}',
+                author=author,
+                image=SimpleUploadedFile(
+                    name=f'rebuild_{i}.gif',
+                    content=unique_gif(i),
+                    content_type='image/gif',
+                ),
+            )
+            for i, author in enumerate(
+                [cls.author, cls.other_author, cls.author]
+            )
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        for post in RebuildThumbnailsCommandTest.posts:
+            default.backend.delete(post.image, delete_file=False)
+
+    def has_thumbnail(self, post):
+        thumbnail_cache.clear()
+        return find_thumbnail(
+            Post.objects.get(pk=post.pk), 'wide'
+        ) is not None
+
+    def rebuild(self, **options):
+        out = StringIO()
+        options.setdefault('workers', 0)
+        call_command(
+            'rebuild_thumbnails',
+            checkpoint=self.checkpoint,
+            stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_rebuilds_all_images(self):
+        """Команда создаёт миниатюры для всех постов с картинками
+        и сообщает скорость."""
+        output = self.rebuild()
+        for post in RebuildThumbnailsCommandTest.posts:
+            with self.subTest(post=post):
+                self.assertTrue(self.has_thumbnail(post))
+        self.assertIn('Обработано картинок: 3', output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_rebuilds_in_worker_processes(self):
+        """Пул из двух процессов создаёт миниатюры всех постов
+        и удаляет файл с позицией."""
+        # Процессы пула не видят тестовую базу в памяти, поэтому пишут
+        # kvstore в базу-файл с той же таблицей. Записи kvstore попадают
+        # и в общий кэш, откуда их читает find_thumbnail.
+        db_path = os.path.join(TEMP_MEDIA_ROOT, 'workers.sqlite3')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT sql FROM sqlite_master '
+                'WHERE tbl_name = %s AND sql IS NOT NULL',
+                [KVStoreModel._meta.db_table],
+            )
+            schema = [sql for sql, in cursor.fetchall()]
+        with sqlite3.connect(db_path) as workers_db:
+            for sql in schema:
+                workers_db.execute(sql)
+        databases = {
+            'default': {**settings.DATABASES['default'], 'NAME': db_path},
+        }
+        cache.clear()
+        with warnings.catch_warnings():
+            # Django предупреждает, что подмена DATABASES не меняет
+            # соединений: здесь она нужна только процессам пула.
+            warnings.simplefilter('ignore')
+            with override_settings(DATABASES=databases):
+                output = self.rebuild(workers=2, report_every=1)
+        for post in RebuildThumbnailsCommandTest.posts:
+            with self.subTest(post=post):
+                self.assertTrue(self.has_thumbnail(post))
+        self.assertIn('Обработано картинок: 3', output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_author_filter(self):
+        """С --author обрабатываются только посты этого автора."""
+        self.rebuild(
+            author=[RebuildThumbnailsCommandTest.other_author.username]
+        )
+        self.assertEqual(
+            [self.has_thumbnail(post)
+             for post in RebuildThumbnailsCommandTest.posts],
+            [False, True, False],
+        )
+
+    def test_resumes_from_checkpoint(self):
+        """Команда продолжает работу после сохранённой позиции."""
+        first = RebuildThumbnailsCommandTest.posts[0]
+        with open(self.checkpoint, 'w') as checkpoint:
+            json.dump({
+                'filters': {
+                    'author': [], 'since': None, 'until': None,
+                    'force': False,
+                },
+                'last_pk': first.pk,
+            }, checkpoint)
+        self.rebuild()
+        self.assertFalse(self.has_thumbnail(first))
+        for post in RebuildThumbnailsCommandTest.posts[1:]:
+            with self.subTest(post=post):
+                self.assertTrue(self.has_thumbnail(post))
+
+    def test_broken_image_does_not_stop_rebuild(self):
+        """Пропавшая картинка не останавливает запуск: остальные
+        обрабатываются, а ошибка попадает в отчёт."""
+        broken = Post.objects.create(
+            text='Пост без файла',
+            author=RebuildThumbnailsCommandTest.author,
+            image=SimpleUploadedFile(
+                name='rebuild_broken.gif',
+                content=unique_gif(100),
+                content_type='image/gif',
+            ),
+        )
+        broken.image.storage.delete(broken.image.name)
+        err = StringIO()
+        with self.assertRaisesMessage(
+            CommandError, f'Не удалось обработать картинок: 1 '
+            f'(посты {broken.pk}).'
+        ), self.assertLogs('sorl.thumbnail', 'ERROR'):
+            self.rebuild(stderr=err)
+        self.assertIn(f'Пост {broken.pk}:', err.getvalue())
+        for post in RebuildThumbnailsCommandTest.posts:
+            with self.subTest(post=post):
+                self.assertTrue(self.has_thumbnail(post))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_checkpoint_is_saved_on_any_error(self):
+        """При любой ошибке, не только Ctrl+C, позиция сохраняется."""
+        class BrokenOutput(StringIO):
+            def write(self, text):
+                raise RuntimeError('диск переполнен')
+
+        with self.assertRaises(RuntimeError):
+            call_command(
+                'rebuild_thumbnails', workers=0, report_every=1,
+                checkpoint=self.checkpoint, stdout=BrokenOutput(),
+            )
+        with open(self.checkpoint) as checkpoint:
+            self.assertEqual(
+                json.load(checkpoint)['last_pk'],
+                RebuildThumbnailsCommandTest.posts[0].pk,
+            )
+
+    def test_rebuild_refreshes_cards_and_pages(self):
+        """Посты с новыми миниатюрами помечаются изменёнными, чтобы
+        карточки отрисовались заново, а страницы сбрасываются."""
+        post = RebuildThumbnailsCommandTest.posts[0]
+        modified = Post.objects.get(pk=post.pk).modified
+        stamps = page_stamps([GROUPS])
+        self.rebuild()
+        self.assertGreater(Post.objects.get(pk=post.pk).modified, modified)
+        self.assertNotEqual(page_stamps([GROUPS]), stamps)
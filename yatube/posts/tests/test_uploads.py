@@ -0,0 +1,172 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, User
+from ..thumbnails import generate_post_thumbnails
+from ..uploads import (compute_post_placeholder, normalize_post_image,
+                       process_post_image)
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def jpeg_with_exif(width, height):
+    exif = Image.Exif()
+    exif[0x010F] = 'Тестовая камера'
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(
+        buffer, 'JPEG', exif=exif.tobytes()
+    )
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ImageUploadTest.author)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, content, name='small.gif'):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name=name, content=content),
+            },
+        )
+
+    def test_rejected_uploads(self):
+        """Слишком большой файл, картинка со слишком большим числом
+        пикселей и не картинка не сохраняются."""
+        cases = (
+            ({'POST_IMAGE_MAX_UPLOAD_SIZE': 10}, SMALL_GIF, 'too_large'),
+            ({'POST_IMAGE_MAX_PIXELS': 1}, SMALL_GIF, 'too_many_pixels'),
+            ({}, b'not an image', 'invalid_image'),
+        )
+        for limits, content, code in cases:
+            with self.subTest(code=code), override_settings(**limits):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    response.context['form'].errors.as_data()['image'][0]
+                    .code,
+                    code,
+                )
+                self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=2 ** 16)
+    def test_oversized_upload_stops_reading(self):
+        """На слишком большом файле чтение запроса обрывается: поля
+        после файла не разбираются, а форма сообщает о размере."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'image': SimpleUploadedFile(
+                    name='large.gif', content=SMALL_GIF * 2 ** 14
+                ),
+                'text': 'Поле после файла',
+            },
+        )
+        form = response.context['form']
+        self.assertEqual(form.errors.as_data()['image'][0].code, 'too_large')
+        self.assertNotIn('text', form.data)
+        self.assertFalse(Post.objects.exists())
+
+    def test_upload_views_check_csrf(self):
+        """Страницы с загрузкой картинок сами проверяют CSRF-токен."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(ImageUploadTest.author)
+        response = client.post(
+            reverse('posts:post_create'), data={'text': 'Без токена'}
+        )
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=50)
+    def test_image_is_normalized_in_background(self):
+        """Фоновая задача убирает EXIF и уменьшает картинку."""
+        self.upload(jpeg_with_exif(200, 100), name='photo.jpg')
+        post = Post.objects.get()
+        old_name = post.image.name
+        normalize_post_image(post.pk)
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertEqual((post.image_width, post.image_height), (50, 25))
+        with post.image.open() as file, Image.open(file) as image:
+            self.assertEqual(image.size, (50, 25))
+            self.assertFalse(image.getexif())
+
+    def test_normal_image_is_kept(self):
+        """Картинка без EXIF в пределах размера не перекодируется."""
+        self.upload(SMALL_GIF)
+        post = Post.objects.get()
+        name = post.image.name
+        normalize_post_image(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+
+    def test_placeholder_is_computed_and_inlined(self):
+        """После загрузки у поста появляется крошечная заглушка, она
+        встраивается в карточку и страницу поста вместе с loading=lazy."""
+        self.upload(SMALL_GIF)
+        post = Post.objects.get()
+        self.assertEqual(post.image_placeholder, '')
+        compute_post_placeholder(post.pk)
+        post.refresh_from_db()
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertLess(len(post.image_placeholder), 1000)
+        detail_url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.assertContains(
+            self.authorized_client.get(detail_url), post.image_placeholder
+        )
+        generate_post_thumbnails(post.pk)
+        for url in (reverse('posts:index'), detail_url):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'loading="lazy"')
+                self.assertContains(response, post.image_placeholder)
+
+    def test_new_image_resets_placeholder(self):
+        """Новая картинка сбрасывает заглушку старой."""
+        self.upload(SMALL_GIF)
+        post = Post.objects.get()
+        process_post_image(post.pk)
+        post.refresh_from_db()
+        self.assertNotEqual(post.image_placeholder, '')
+        post.image = SimpleUploadedFile(
+            name='photo.jpg', content=jpeg_with_exif(20, 10)
+        )
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_placeholder, '')
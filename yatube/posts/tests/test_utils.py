@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..cache import feed_count_key
+from ..models import Group, Post, User
+from ..utils import CountCachedPaginator
+
+
+class CountCachedPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.group_1 = Group.objects.create(
+            title='Первая тестовая группа',
+            slug='test-slug-1',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Вторая тестовая группа',
+            slug='test-slug-2',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group_1,
+        )
+
+    def make_paginator(self, queryset, scope):
+        return CountCachedPaginator(
+            queryset.order_by('-created'), 10, feed_count_key(scope)
+        )
+
+    def test_count_is_taken_from_cache(self):
+        """Повторный подсчёт постов ленты не обращается к БД."""
+        self.assertEqual(self.make_paginator(Post.objects, 'all').count, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.make_paginator(Post.objects, 'all').count, 1
+            )
+
+    def test_new_post_resets_cached_counts(self):
+        """Новый пост сбрасывает счётчики общей ленты, группы и автора."""
+        scopes = {
+            'all': Post.objects.all(),
+            f'group:{self.group_1.pk}': self.group_1.posts.all(),
+            f'author:{self.author.pk}': self.author.posts.all(),
+        }
+        for scope, queryset in scopes.items():
+            self.make_paginator(queryset, scope).count
+        Post.objects.create(
+            text='Ещё один пост', author=self.author, group=self.group_1
+        )
+        for scope, queryset in scopes.items():
+            with self.subTest(scope=scope):
+                self.assertEqual(self.make_paginator(queryset, scope).count, 2)
+
+    def test_moving_post_resets_both_groups(self):
+        """Перенос поста в другую группу сбрасывает счётчики обеих групп."""
+        self.make_paginator(
+            self.group_1.posts.all(), f'group:{self.group_1.pk}'
+        ).count
+        self.make_paginator(
+            self.group_2.posts.all(), f'group:{self.group_2.pk}'
+        ).count
+        self.post.group = self.group_2
+        self.post.save()
+        self.assertEqual(self.make_paginator(
+            self.group_1.posts.all(), f'group:{self.group_1.pk}'
+        ).count, 0)
+        self.assertEqual(self.make_paginator(
+            self.group_2.posts.all(), f'group:{self.group_2.pk}'
+        ).count, 1)
+
+    def test_elided_page_range(self):
+        """В шаблон уходит окно страниц с многоточиями."""
+        paginator = CountCachedPaginator(list(range(1000)), 10)
+        ellipsis = CountCachedPaginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100],
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, ellipsis, 100],
+        )
+        self.assertEqual(
+            list(CountCachedPaginator(list(range(30)), 10).page_range),
+            list(CountCachedPaginator(
+                list(range(30)), 10
+            ).get_elided_page_range(2)),
+        )
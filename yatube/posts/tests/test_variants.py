@@ -0,0 +1,117 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, User
+from ..thumbnails import generate_post_thumbnails
+from ..variants import Variant, evict_variants, variant_token
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+VARIANT_CACHE_DIR = os.path.join(TEMP_MEDIA_ROOT, 'variants')
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'blue').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_VARIANT_CACHE_DIR=VARIANT_CACHE_DIR,
+)
+class ImageVariantTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        shutil.rmtree(VARIANT_CACHE_DIR, ignore_errors=True)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile(name='big.png', content=png(200, 100)),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def variant_url(self, width, height, crop=True):
+        return reverse(
+            'posts:image_variant',
+            args=[variant_token(
+                ImageVariantTest.post.image.name, width, height, crop
+            )],
+        )
+
+    def test_variant_is_resized_and_cached(self):
+        """Копия нужного размера создаётся один раз и отдаётся
+        с ETag и заголовками неизменяемого ресурса."""
+        url = self.variant_url(40, 40)
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        image = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (40, 40))
+        variant = Variant(ImageVariantTest.post.image.name, 40, 40, True)
+        self.assertEqual(response['ETag'], variant.etag)
+        self.assertTrue(os.path.exists(variant.path))
+        fitted = self.guest_client.get(self.variant_url(40, 40, crop=False))
+        image = Image.open(io.BytesIO(b''.join(fitted.streaming_content)))
+        self.assertEqual(image.size, (40, 20))
+
+    def test_etag_gives_not_modified(self):
+        """Запрос с тем же ETag получает 304."""
+        url = self.variant_url(40, 40)
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_bad_tokens_are_not_found(self):
+        """Поддельное описание и слишком большой размер дают 404."""
+        urls = [
+            self.variant_url(40, 40)[:-3] + 'xx/',
+            self.variant_url(settings.POST_IMAGE_MAX_SIDE + 1, 40),
+            reverse(
+                'posts:image_variant',
+                args=[variant_token('posts/missing.png', 40, 40)],
+            ),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+    def test_post_detail_links_to_variant(self):
+        """Страница поста ссылается на крупную копию картинки."""
+        generate_post_thumbnails(ImageVariantTest.post.pk)
+        response = self.guest_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': ImageVariantTest.post.pk}
+        ))
+        self.assertContains(
+            response, self.variant_url(1920, 1920, crop=False)
+        )
+
+    @override_settings(POST_IMAGE_VARIANT_CACHE_SIZE=0)
+    def test_eviction_removes_old_variants(self):
+        """Копии сверх размера кэша удаляются, начиная с давно
+        не читанных."""
+        self.guest_client.get(self.variant_url(40, 40))
+        evict_variants()
+        variant = Variant(ImageVariantTest.post.image.name, 40, 40, True)
+        self.assertFalse(os.path.exists(variant.path))
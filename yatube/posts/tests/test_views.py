@@ -2,12 +2,15 @@ import tempfile
 import shutil
 from random import randint
 
+from django.core.cache import _create_cache, cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 
-from ..models import User, Post, Group, Comment
+from ..cache import (GROUPS, INDEX_PAGES, PAGE_CACHE_MISSES, author_pages,
+                     group_pages, page_cache_stats, touch_pages)
+from ..models import User, PageStamp, Post, Group, Comment
 from django.conf import settings
 
 
@@ -17,6 +20,7 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostViewsTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostViewsTest.author)
         self.guest_client = Client()
@@ -314,6 +318,7 @@ class PostViewsTest(TestCase):
 
 class TestPaginator(TestCase):
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(TestPaginator.author)
 
@@ -391,3 +396,484 @@ class TestPaginator(TestCase):
                  f' {TestPaginator.second_page_obj_count}'
                  f' на второй странице {url}')
             )
+
+    def test_cursor_pagination_next_and_previous(self):
+        """Проверяем, что курсор ведёт на следующую страницу,
+        а курсор предыдущей страницы возвращает к первой."""
+        reversed_urls = [
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': TestPaginator.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': TestPaginator.author.username}
+            )
+        ]
+        for url in reversed_urls:
+            with self.subTest(url=url):
+                first_page = self.authorized_client.get(url).context[
+                    'page_obj'
+                ]
+                self.assertFalse(first_page.has_previous())
+                second_page = self.authorized_client.get(
+                    url, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    TestPaginator.second_page_obj_count,
+                    len(second_page),
+                    f'Неверное количество постов на второй странице {url}'
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(
+                    set(first_page) & set(second_page),
+                    'Посты на соседних страницах повторяются'
+                )
+                previous_page = self.authorized_client.get(
+                    url, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(first_page), list(previous_page))
+                self.assertFalse(previous_page.has_previous())
+
+    def test_numbered_page_shows_page_window(self):
+        """На нумерованной странице в шаблон передаётся окно страниц."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'page': 2}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.page_window, [1, 2])
+        self.assertEqual(
+            TestPaginator.second_page_obj_count, len(page_obj)
+        )
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 1)
+        self.assertEqual(TestPaginator.first_page_obj_count, len(page_obj))
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PageCacheTest.author)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.other_author = User.objects.create_user(username='OtherUser')
+        cls.group = Group.objects.create(
+            title='Первая тестовая группа',
+            slug='test-slug-1',
+        )
+        cls.other_group = Group.objects.create(
+            title='Вторая тестовая группа',
+            slug='test-slug-2',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}
+            ),
+            'other_group': reverse(
+                'posts:group_list', kwargs={'slug': cls.other_group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': cls.author.username}
+            ),
+            'other_profile': reverse(
+                'posts:profile',
+                kwargs={'username': cls.other_author.username}
+            ),
+            'detail': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.id}
+            ),
+        }
+
+    def cache_status(self, url):
+        return self.guest_client.get(url).get('X-Page-Cache')
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос отдаётся из кэша без Vary: Cookie."""
+        for url in PageCacheTest.urls.values():
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                second = self.guest_client.get(url)
+                self.assertEqual(first['X-Page-Cache'], 'MISS')
+                self.assertEqual(second['X-Page-Cache'], 'HIT')
+                self.assertEqual(first.content, second.content)
+                self.assertNotIn('Cookie', first.get('Vary', ''))
+                self.assertNotIn('Cookie', second.get('Vary', ''))
+
+    def test_authorized_pages_are_not_cached(self):
+        """Страницы для авторизованного пользователя не кэшируются."""
+        self.authorized_client.get(PageCacheTest.urls['index'])
+        response = self.authorized_client.get(PageCacheTest.urls['index'])
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_new_post_resets_related_pages_only(self):
+        """Новый пост сбрасывает главную, ленту своей группы и автора,
+        страницы постов автора, но не трогает чужие ленты."""
+        for url in PageCacheTest.urls.values():
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Новый пост',
+            author=PageCacheTest.author,
+            group=PageCacheTest.group,
+        )
+        expected = {
+            'index': 'MISS',
+            'group': 'MISS',
+            'profile': 'MISS',
+            'other_group': 'HIT',
+            'other_profile': 'HIT',
+            # На странице поста выводится число постов автора.
+            'detail': 'MISS',
+        }
+        for name, status in expected.items():
+            with self.subTest(page=name):
+                self.assertEqual(
+                    self.cache_status(PageCacheTest.urls[name]), status
+                )
+
+    def test_new_comment_resets_post_detail(self):
+        """Новый комментарий сбрасывает страницу поста."""
+        url = PageCacheTest.urls['detail']
+        self.guest_client.get(url)
+        Comment.objects.create(
+            post=PageCacheTest.post,
+            author=PageCacheTest.other_author,
+            text='Новый комментарий',
+        )
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_author_name_edit_resets_pages(self):
+        """Смена имени автора сбрасывает страницы, а вход на сайт -
+        нет."""
+        url = PageCacheTest.urls['index']
+        self.guest_client.get(url)
+        self.authorized_client.force_login(PageCacheTest.other_author)
+        self.assertEqual(self.cache_status(url), 'HIT')
+        author = User.objects.get(pk=PageCacheTest.author.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Лев Толстой')
+
+    def test_page_cache_counts_hits_and_misses(self):
+        url = PageCacheTest.urls['index']
+        self.guest_client.get(url)
+        self.guest_client.get(url)
+        self.guest_client.get(url)
+        self.assertEqual(page_cache_stats(), {'hits': 2, 'misses': 1})
+
+    def test_page_cache_is_shared_between_processes(self):
+        """Кэш страниц не в памяти процесса: страницу, закэшированную
+        одним воркером, видит и сбрасывает другой."""
+        self.assertNotEqual(
+            settings.CACHES['default']['BACKEND'],
+            'django.core.cache.backends.locmem.LocMemCache',
+        )
+        url = PageCacheTest.urls['index']
+        self.guest_client.get(url)
+        # Отдельный экземпляр бэкенда, как в другом процессе.
+        other_worker = _create_cache('default')
+        self.assertEqual(other_worker.get(PAGE_CACHE_MISSES), 1)
+        other_worker.clear()
+        self.assertEqual(self.cache_status(url), 'MISS')
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostCardCacheTest.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(PostCardCacheTest.reader)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+        )
+        cls.edit_url = reverse(
+            'posts:post_edit', kwargs={'post_id': cls.post.id}
+        )
+
+    def test_cards_are_taken_from_cache(self):
+        """Повторный показ ленты не рендерит шаблон карточки."""
+        url = reverse('posts:index')
+        response = self.authorized_client.get(url)
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
+        response = self.authorized_client.get(url)
+        self.assertTemplateNotUsed(
+            response, 'posts/includes/post_card.html'
+        )
+        self.assertContains(response, PostCardCacheTest.post.text)
+
+    def test_card_depends_on_viewer(self):
+        """Автор и читатель получают разные варианты карточки."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        self.assertContains(
+            self.authorized_client.get(url), PostCardCacheTest.edit_url
+        )
+        self.assertNotContains(
+            self.reader_client.get(url), PostCardCacheTest.edit_url
+        )
+
+    def test_edited_post_card_is_rendered_again(self):
+        """После сохранения поста карточка рендерится заново."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        post = Post.objects.get(pk=PostCardCacheTest.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        response = self.authorized_client.get(url)
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
+        self.assertContains(response, 'Отредактированный пост')
+
+    def test_card_is_rendered_again_after_group_edit(self):
+        """После смены адреса группы карточка ссылается на новый."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        Post.objects.create(
+            text='Пост в группе', author=PostCardCacheTest.author,
+            group=group,
+        )
+        url = reverse('posts:index')
+        self.reader_client.get(url)
+        group.slug = 'new-slug'
+        group.save()
+        response = self.reader_client.get(url)
+        self.assertContains(
+            response, reverse('posts:group_list', args=['new-slug'])
+        )
+        self.assertNotContains(
+            response, reverse('posts:group_list', args=['old-slug'])
+        )
+
+    def test_card_is_rendered_again_after_author_edit(self):
+        """После смены имени автора карточка показывает новое."""
+        url = reverse('posts:index')
+        self.reader_client.get(url)
+        author = User.objects.get(pk=PostCardCacheTest.author.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        self.assertContains(self.reader_client.get(url), 'Лев Толстой')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTest.author)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': cls.author.username}
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        ]
+
+    def test_unchanged_page_is_not_modified(self):
+        """Анонимный запрос с прежним ETag или Last-Modified получает
+        304 после одного запроса к базе - чтения отметок страницы."""
+        for url in ConditionalGetTest.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                validators = [
+                    {'HTTP_IF_NONE_MATCH': response['ETag']},
+                    {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+                ]
+                for headers in validators:
+                    with self.assertNumQueries(1):
+                        not_modified = self.guest_client.get(url, **headers)
+                    self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_make_page_modified(self):
+        """Новый комментарий меняет валидаторы ленты и страницы поста."""
+        etags = {
+            url: self.guest_client.get(url)['ETag']
+            for url in ConditionalGetTest.urls
+        }
+        Comment.objects.create(
+            post=ConditionalGetTest.post,
+            author=ConditionalGetTest.author,
+            text='Комментарий',
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_validators_do_not_depend_on_cache(self):
+        """Валидаторы берутся из базы: после очистки кэша (или в другом
+        процессе) страница по-прежнему не изменена."""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        cache.clear()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_of_author_modifies_post_detail(self):
+        """Новый пост автора меняет число постов на страницах его
+        остальных постов."""
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': ConditionalGetTest.post.pk}
+        )
+        etag = self.guest_client.get(url)['ETag']
+        Post.objects.create(
+            text='Ещё пост', author=ConditionalGetTest.author,
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Всего постов автора:  <span >2')
+
+    def test_missing_pages_do_not_write(self):
+        """Запросы к несуществующим страницам не создают отметок."""
+        urls = [
+            reverse('posts:profile', kwargs={'username': 'nobody'}),
+            reverse('posts:group_list', kwargs={'slug': 'nothing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6}),
+            reverse('api:group_detail', kwargs={'slug': 'nothing'}),
+        ]
+        stamps = PageStamp.objects.count()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+        self.assertEqual(PageStamp.objects.count(), stamps)
+
+    def test_validators_depend_on_user(self):
+        """ETag зависит от пользователя, Last-Modified авторизованному
+        не выдаётся."""
+        url = reverse('posts:index')
+        anonymous_etag = self.guest_client.get(url)['ETag']
+        response = self.authorized_client.get(url)
+        self.assertNotEqual(response['ETag'], anonymous_etag)
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=anonymous_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(POSTS_PAGE_CACHE_TIMEOUT=0)
+class FeedQueryCountTest(TestCase):
+    """Число запросов лент не зависит от размера страницы: автор
+    и группа каждой карточки приходят в запросе постов."""
+    # Сессия и пользователь, отметки страницы, количество постов
+    # в кэше нет, посты; у профиля ещё автор, у группы - сама группа.
+    QUERIES = {
+        'posts:index': 5,
+        'posts:group_list': 6,
+        'posts:profile': 6,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueryCountTest.authors[0])
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(
+                username=f'Author{i}', first_name='Имя', last_name='Фамилия'
+            )
+            for i in range(2)
+        ]
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}')
+            for i in range(2)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост #{i}',
+                author=cls.authors[i % 2],
+                group=cls.groups[i % 4 // 2],
+            )
+            for i in range(24)
+        )
+        # Отметки страниц уже есть, как на работающем сайте.
+        touch_pages([
+            INDEX_PAGES, GROUPS, group_pages(cls.groups[0].slug),
+            author_pages(cls.authors[0].username),
+        ])
+        cls.urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.groups[0].slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': cls.authors[0].username}
+            ),
+        }
+
+    def test_feed_query_count(self):
+        """Страница из 2 и из 10 постов делает одинаковое число
+        запросов."""
+        for name, url in FeedQueryCountTest.urls.items():
+            for page_size in (2, 10):
+                with self.subTest(url=url, page_size=page_size), \
+                        override_settings(POSTS_VIEWED=page_size):
+                    cache.clear()
+                    with self.assertNumQueries(self.QUERIES[name]):
+                        response = self.authorized_client.get(url)
+                    self.assertEqual(
+                        len(response.context['page_obj']), page_size
+                    )
+
+    def test_feed_fetches_card_columns_only(self):
+        """Лента не выбирает столбцы, которых нет в карточке."""
+        post = Post.objects.for_feed().first()
+        self.assertEqual(
+            post.get_deferred_fields(),
+            {'image_width', 'image_height', 'image_size', 'image_format'},
+        )
+        with self.assertNumQueries(0):
+            post.author.get_full_name()
+            post.group.slug
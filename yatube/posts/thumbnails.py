@@ -0,0 +1,198 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from .models import Post
+from .tasks import run_in_background
+
+
+# Имена картинок, миниатюры которых сейчас создаются в этом процессе.
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def failed_thumbnails_key(name):
+    """Ключ кэша с отметкой, что миниатюры картинки name создать
+    не удалось."""
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return f'posts:thumbnails-failed:{digest}'
+
+
+class LRUCache:
+    """Ограниченный по числу записей словарь в памяти процесса:
+    при переполнении вытесняется давно не читанная запись."""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+        return found
+
+    def set_many(self, values):
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Сериализованные записи kvstore о готовых миниатюрах. Отсутствие
+# миниатюры сюда не попадает: она появится после фоновой задачи.
+thumbnail_cache = LRUCache(settings.POST_THUMBNAILS_LRU_SIZE)
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Считает имя миниатюры, не создавая её."""
+    def thumbnail_name(self, file_, geometry_string, **options):
+        """Имя файла, которое get_thumbnail дал бы миниатюре."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+
+backend = ReadyThumbnailBackend()
+
+
+def _kvstore_key(post, alias):
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    name = backend.thumbnail_name(post.image, geometry, **options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _lookup(keys):
+    """Записи kvstore по ключам: сначала из памяти процесса, затем
+    одним get_many_raw из kvstore sorl (posts.kvstore.KVStore)."""
+    found = thumbnail_cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = default.kvstore.get_many_raw(missing)
+        thumbnail_cache.set_many(stored)
+        found.update(stored)
+    return found
+
+
+def prefetch_thumbnails(posts, alias):
+    """Находит готовые миниатюры для всех постов разом и запоминает
+    их в post._thumbnails, где их потом берёт ready_thumbnail."""
+    posts = [
+        post for post in posts
+        if post.image and alias not in getattr(post, '_thumbnails', {})
+    ]
+    keys = {post.pk: _kvstore_key(post, alias) for post in posts}
+    found = _lookup(list(set(keys.values())))
+    for post in posts:
+        value = found.get(keys[post.pk])
+        if not hasattr(post, '_thumbnails'):
+            post._thumbnails = {}
+        post._thumbnails[alias] = (
+            deserialize_image_file(value) if value else None
+        )
+
+
+def find_thumbnail(post, alias):
+    """Готовая миниатюра картинки поста или None, если её ещё нет."""
+    if not post.image:
+        return None
+    prefetch_thumbnails([post], alias)
+    return post._thumbnails[alias]
+
+
+def ready_thumbnail(post, alias):
+    """Как find_thumbnail, но отсутствующие миниатюры ставятся
+    в очередь на создание."""
+    thumbnail = find_thumbnail(post, alias)
+    if thumbnail is None:
+        queue_post_thumbnails(post)
+    return thumbnail
+
+
+def queue_post_thumbnails(post):
+    """Ставит создание миниатюр в очередь, если их картинка уже
+    не в работе и не падала за последние
+    settings.POST_THUMBNAILS_RETRY_AFTER секунд."""
+    if not post.image:
+        return
+    name = post.image.name
+    with _pending_lock:
+        if name in _pending:
+            return
+    if cache.get(failed_thumbnails_key(name)):
+        return
+    run_in_background(_generate_once, post.pk, name)
+
+
+def _generate_once(post_id, name):
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    try:
+        generate_post_thumbnails(post_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def make_thumbnails(image, force=False):
+    """Создаёт миниатюры всех размеров из settings.POST_THUMBNAILS.
+    С force=True старые миниатюры картинки удаляются заранее.
+
+    sorl не выбрасывает ошибку, если картинку не удалось прочитать,
+    а только пишет её в лог, поэтому успех проверяется по записи
+    миниатюры в kvstore."""
+    if force:
+        default.backend.delete(image, delete_file=False)
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        thumbnail = get_thumbnail(image, geometry, **options)
+        if default.kvstore.get(thumbnail) is None:
+            raise OSError(
+                f'Не удалось создать миниатюру {geometry} для {image.name}'
+            )
+
+
+def generate_post_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    try:
+        make_thumbnails(post.image)
+    except OSError:
+        cache.set(
+            failed_thumbnails_key(post.image.name), True,
+            settings.POST_THUMBNAILS_RETRY_AFTER,
+        )
+        raise
+    # Карточки и страницы с заглушкой устарели. Сохранение modified
+    # сбрасывает их кэш через сигналы и не трогает остальные поля.
+    post.save(update_fields=['modified'])
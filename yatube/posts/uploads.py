@@ -0,0 +1,150 @@
+import io
+import os
+import warnings
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from django.db import transaction
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+from .images import image_metadata, image_preview
+from .models import Post
+from .tasks import run_in_background
+from .thumbnails import generate_post_thumbnails
+
+
+class SizeLimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемые файлы на диск кусками, не держа их в памяти.
+    Как только файл перерастает settings.POST_IMAGE_MAX_UPLOAD_SIZE,
+    остаток запроса не читается, а файл с пометкой truncated остаётся
+    в oversized: ошибку показывает форма."""
+    oversized = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            self.file.truncated = True
+            self.file.size = self.received
+            self.oversized = self.file
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
+
+
+def limit_upload_size(view):
+    """Принимает файлы view через SizeLimitedUploadHandler; у остальных
+    view обработчики загрузки по умолчанию. Обработчик ставится до
+    чтения тела запроса, поэтому CSRF проверяется здесь, а не в
+    CsrfViewMiddleware."""
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        handler = SizeLimitedUploadHandler(request)
+        request.upload_handlers = [handler]
+        if request.method == 'POST':
+            # Тело читается здесь, чтобы вернуть в FILES файл, на котором
+            # чтение оборвалось: парсер его не сохраняет.
+            files = request.FILES
+            if handler.oversized is not None:
+                files.appendlist(handler.field_name, handler.oversized)
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def _needs_normalizing(image):
+    return (
+        max(image.size) > settings.POST_IMAGE_MAX_SIDE
+        or bool(image.getexif())
+    )
+
+
+def _normalized(image):
+    """Картинка без EXIF, повёрнутая по его ориентации и уменьшенная
+    до settings.POST_IMAGE_MAX_SIDE по большей стороне."""
+    image_format = image.format
+    image = ImageOps.exif_transpose(image)
+    side = settings.POST_IMAGE_MAX_SIDE
+    image.thumbnail((side, side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=settings.POST_IMAGE_JPEG_QUALITY,
+            optimize=True,
+        )
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def normalize_post_image(post_id):
+    """Убирает EXIF из картинки поста и уменьшает её до предельного
+    размера. Анимированные картинки и картинки, которые уже в норме,
+    не перекодируются."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    old_name = post.image.name
+    with post.image.open() as file, warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        image = Image.open(file)
+        if getattr(image, 'is_animated', False):
+            return
+        if not _needs_normalizing(image):
+            return
+        content = _normalized(image)
+    storage = post.image.storage
+    new_name = storage.save(
+        post.image.field.generate_filename(
+            post, os.path.basename(old_name)
+        ),
+        content,
+    )
+    with transaction.atomic():
+        post = Post.objects.select_for_update().filter(pk=post_id).first()
+        # Пока картинка обрабатывалась, автор мог заменить её.
+        if post is None or post.image.name != old_name:
+            return
+        post.image.name = new_name
+        post.set_image_metadata(image_metadata(content))
+        post.save(update_fields=[
+            'image', 'image_width', 'image_height', 'image_size',
+            'image_format', 'modified',
+        ])
+    # Хранилище не дублирует одинаковые файлы: старый файл удаляем,
+    # только если на него больше никто не ссылается.
+    if not Post.objects.filter(image=old_name).exists():
+        storage.delete(old_name)
+
+
+def compute_post_placeholder(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image or post.image_placeholder:
+        return
+    with post.image.open() as file, warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        placeholder = image_preview(file)
+    # Страницы сбросит сохранение поста в generate_post_thumbnails.
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        image_placeholder=placeholder
+    )
+
+
+def process_post_image(post_id):
+    normalize_post_image(post_id)
+    compute_post_placeholder(post_id)
+    generate_post_thumbnails(post_id)
+
+
+def queue_post_image(post):
+    """Нормализует картинку поста и создаёт её миниатюры в фоне."""
+    if post.image:
+        run_in_background(process_post_image, post.pk)
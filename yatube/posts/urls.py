@@ -17,4 +17,5 @@ urlpatterns = [
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('create/', views.post_create, name='post_create'),
+    path('images/<str:token>/', views.image_variant, name='image_variant'),
 ]
@@ -1,8 +1,184 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
-def paginate(request, obj_list, obj_count):
-    paginator = Paginator(obj_list, obj_count)
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def encode_position(created, pk, direction):
+    """Кодирует позицию (created, id) в строку для url."""
+    value = f'{direction}|{created.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def encode_cursor(obj, direction):
+    return encode_position(obj.created, obj.pk, direction)
+
+
+def decode_cursor(cursor):
+    """Возвращает кортеж (direction, created, pk) или None,
+    если курсор испорчен."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, created, pk = value.split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or created is None:
+        return None
+    return direction, created, pk
+
+
+class CursorPage(Page):
+    """Страница, которая знает курсоры соседних страниц.
+    У страниц, открытых по курсору, номер неизвестен (number is None)."""
+    def __init__(self, object_list, number, paginator,
+                 has_next, has_previous):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        if self.number is None:
+            return '<CursorPage>'
+        return super().__repr__()
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self:
+            return None
+        return encode_cursor(self[-1], CURSOR_NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self:
+            return None
+        return encode_cursor(self[0], CURSOR_PREVIOUS)
+
+    @property
+    def page_window(self):
+        """Номера страниц вокруг текущей, с многоточиями на месте
+        пропусков. У страниц по курсору номера нет, и окна тоже."""
+        if self.number is None:
+            return []
+        return list(self.paginator.get_elided_page_range(self.number))
+
+
+class CountCachedPaginator(Paginator):
+    """Paginator, который берёт количество объектов из кэша по ключу
+    count_key, а не считает его COUNT(*) на каждый запрос. Ключи
+    сбрасываются сигналами при создании, переносе и удалении постов."""
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        count = cache.get(self.count_key)
+        if count is None:
+            count = super().count
+            cache.set(
+                self.count_key, count, settings.POSTS_COUNT_CACHE_TIMEOUT
+            )
+        return count
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Короткий диапазон страниц вместо page_range целиком:
+        1 … 4 5 [6] 7 8 … 120."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(
+                self.num_pages - on_ends + 1, self.num_pages + 1
+            )
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPaginator(CountCachedPaginator):
+    """Паджинатор по ключу (created, id). Страница по курсору
+    выбирается условием WHERE, а не OFFSET, поэтому её стоимость
+    не зависит от того, насколько далеко она от начала ленты.
+    Нумерованные страницы (?page=) остаются для старых ссылок."""
+    ordering = ('-created', '-pk')
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+
+    def _get_page(self, object_list, number, paginator,
+                  has_next=None, has_previous=None):
+        if has_next is None:
+            has_next = number < self.num_pages
+        if has_previous is None:
+            has_previous = number > 1
+        return CursorPage(
+            object_list, number, paginator, has_next, has_previous
+        )
+
+    def _fetch(self, object_list):
+        """Берёт на один объект больше, чтобы узнать,
+        есть ли что-то за границей страницы, без COUNT(*)."""
+        rows = list(object_list[:self.per_page + 1])
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def cursor_page(self, cursor=None):
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            rows, has_more = self._fetch(self.object_list)
+            return self._get_page(
+                rows, 1, self, has_next=has_more, has_previous=False
+            )
+        direction, created, pk = position
+        if direction == CURSOR_NEXT:
+            rows, has_more = self._fetch(self.object_list.filter(
+                Q(created__lt=created) | Q(created=created, pk__lt=pk)
+            ))
+            return self._get_page(
+                rows, None, self, has_next=has_more, has_previous=True
+            )
+        rows, has_more = self._fetch(self.object_list.filter(
+            Q(created__gt=created) | Q(created=created, pk__gt=pk)
+        ).reverse())
+        return self._get_page(
+            rows[::-1], None, self, has_next=True, has_previous=has_more
+        )
+
+
+def paginate(request, obj_list, obj_count, count_key=None):
+    paginator = CursorPaginator(obj_list, obj_count, count_key=count_key)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.cursor_page(request.GET.get('cursor'))
@@ -0,0 +1,161 @@
+import fcntl
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+import time
+import warnings
+
+from django.conf import settings
+from django.core import signing
+from PIL import Image, ImageOps
+
+from .tasks import get_executor
+
+
+SALT = 'posts.image_variant'
+
+_last_eviction = 0
+_eviction_lock = threading.Lock()
+
+
+class Variant:
+    """Уменьшенная копия картинки поста в кэше на диске."""
+    def __init__(self, name, width, height, crop):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.crop = crop
+        # Имя картинки содержит хэш её содержимого, поэтому копия
+        # с тем же описанием всегда одинакова: ETag строгий.
+        self.digest = hashlib.sha256(
+            f'{name}|{width}x{height}|{int(crop)}'.encode()
+        ).hexdigest()
+        self.path = os.path.join(
+            settings.POST_IMAGE_VARIANT_CACHE_DIR,
+            self.digest[:2],
+            self.digest,
+        )
+
+    @property
+    def etag(self):
+        return f'"{self.digest}"'
+
+    @property
+    def content_type(self):
+        # Копия сохраняется в формате исходной картинки.
+        return mimetypes.guess_type(self.name)[0]
+
+
+def variant_token(name, width, height, crop=True):
+    """Подписанное описание копии для адреса posts:image_variant.
+    Подпись без отметки времени, чтобы адрес копии не менялся."""
+    value = signing.b64_encode(
+        json.dumps([name, width, height, crop]).encode()
+    ).decode()
+    return signing.Signer(salt=SALT).sign(value)
+
+
+def variant_from_token(token):
+    """Variant по подписанному описанию. Бросает signing.BadSignature
+    для поддельного описания и ValueError для недопустимого размера."""
+    value = signing.Signer(salt=SALT).unsign(token)
+    try:
+        name, width, height, crop = json.loads(signing.b64_decode(
+            value.encode()
+        ))
+    except (TypeError, ValueError) as error:
+        raise signing.BadSignature(value) from error
+    for side in (width, height):
+        if not 0 < side <= settings.POST_IMAGE_MAX_SIDE:
+            raise ValueError(f'Недопустимый размер: {width}x{height}')
+    return Variant(name, width, height, bool(crop))
+
+
+def _resize(variant, storage):
+    with storage.open(variant.name) as file, warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        image = Image.open(file)
+        image_format = image.format
+        size = (variant.width, variant.height)
+        if variant.crop:
+            image = ImageOps.fit(image, size, Image.LANCZOS)
+        else:
+            image.thumbnail(size, Image.LANCZOS)
+        if image_format == 'JPEG':
+            image = image.convert('RGB')
+        tmp_path = f'{variant.path}.{os.getpid()}.tmp'
+        try:
+            image.save(tmp_path, image_format)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, variant.path)
+
+
+def open_variant(variant, storage):
+    """Открытый файл копии. Копия создаётся один раз: параллельные
+    запросы одной копии ждут на блокировке файла, пока её создаёт
+    первый, и потом отдают готовый файл."""
+    try:
+        file = open(variant.path, 'rb')
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(variant.path), exist_ok=True)
+        with open(f'{variant.path}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if not os.path.exists(variant.path):
+                    _resize(variant, storage)
+                    schedule_eviction()
+                file = open(variant.path, 'rb')
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    else:
+        # Время изменения служит отметкой последнего чтения для LRU.
+        os.utime(variant.path)
+    return file
+
+
+def _cached_variants():
+    """(время чтения, размер, путь) всех копий в кэше."""
+    for root, _, names in os.walk(settings.POST_IMAGE_VARIANT_CACHE_DIR):
+        for name in names:
+            if name.endswith(('.lock', '.tmp')):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def evict_variants():
+    """Удаляет давно не читанные копии, пока кэш не уложится
+    в settings.POST_IMAGE_VARIANT_CACHE_SIZE байт."""
+    files = sorted(_cached_variants())
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= settings.POST_IMAGE_VARIANT_CACHE_SIZE:
+            break
+        for stale in (path, f'{path}.lock'):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+
+def schedule_eviction():
+    """Запускает evict_variants в фоне не чаще раза
+    в settings.POST_IMAGE_VARIANT_EVICTION_INTERVAL секунд."""
+    global _last_eviction
+    interval = settings.POST_IMAGE_VARIANT_EVICTION_INTERVAL
+    with _eviction_lock:
+        now = time.monotonic()
+        if now - _last_eviction < interval:
+            return
+        _last_eviction = now
+    get_executor().submit(evict_variants)
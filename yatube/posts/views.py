@@ -1,28 +1,42 @@
 from django.contrib.auth.decorators import login_required
+from django.core import signing
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
 
+from .cache import (GROUPS, INDEX_PAGES, author_pages, cached_page,
+                    feed_count_key, group_pages, post_detail_scopes)
 from .forms import PostForm, CommentForm
 from .models import Group, Post, User
+from .uploads import limit_upload_size, queue_post_image
 from .utils import paginate
+from .variants import open_variant, variant_from_token
 
 
+@cached_page(lambda: [INDEX_PAGES, GROUPS])
 def index(request):
-    post_list = Post.objects.select_related(
-        'group',
-        'author'
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(
+        request, post_list, settings.POSTS_VIEWED, feed_count_key('all')
     )
-    page_obj = paginate(request, post_list, settings.POSTS_VIEWED)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cached_page(lambda slug: [group_pages(slug), GROUPS])
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author')
-    page_obj = paginate(request, post_list, settings.POSTS_VIEWED)
+    post_list = group.posts.for_feed()
+    page_obj = paginate(
+        request,
+        post_list,
+        settings.POSTS_VIEWED,
+        feed_count_key(f'group:{group.pk}'),
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -30,10 +44,21 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cached_page(
+    lambda username: [author_pages(username), GROUPS]
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = paginate(request, posts, settings.POSTS_VIEWED)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    posts = author.posts.for_feed()
+    page_obj = paginate(
+        request,
+        posts,
+        settings.POSTS_VIEWED,
+        feed_count_key(f'author:{author.pk}'),
+    )
     context = {
         'page_obj': page_obj,
         'author': author,
@@ -41,10 +66,14 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@cached_page(post_detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('group', 'author__stats'),
+        id=post_id
+    )
     form = CommentForm()
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'form': form,
@@ -54,6 +83,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@limit_upload_size
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -64,12 +94,13 @@ def post_create(request):
     }
     if form.is_valid():
         form.instance.author = request.user
-        form.save()
+        queue_post_image(form.save())
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', context)
 
 
 @login_required
+@limit_upload_size
 def post_edit(request, post_id):
     edited_post = get_object_or_404(Post, id=post_id)
     if not request.user == edited_post.author:
@@ -85,7 +116,7 @@ def post_edit(request, post_id):
     }
     if not form.is_valid():
         return render(request, 'posts/create_post.html', context)
-    form.save()
+    queue_post_image(form.save())
     return redirect('posts:post_detail', post_id)
 
 
@@ -99,3 +130,29 @@ def add_comment(request, post_id):
         comment.post = post
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+# Адрес копии содержит хэш картинки и её размеры, поэтому копия
+# по нему никогда не меняется.
+IMMUTABLE = {'public': True, 'max_age': 60 * 60 * 24 * 365, 'immutable': True}
+
+
+@require_safe
+def image_variant(request, token):
+    try:
+        variant = variant_from_token(token)
+    except (signing.BadSignature, ValueError):
+        raise Http404('Неверный адрес картинки')
+    not_modified = get_conditional_response(request, etag=variant.etag)
+    if not_modified is not None:
+        not_modified['ETag'] = variant.etag
+        patch_cache_control(not_modified, **IMMUTABLE)
+        return not_modified
+    try:
+        file = open_variant(variant, Post._meta.get_field('image').storage)
+    except FileNotFoundError:
+        raise Http404('Картинка не найдена')
+    response = FileResponse(file, content_type=variant.content_type)
+    response['ETag'] = variant.etag
+    patch_cache_control(response, **IMMUTABLE)
+    return response
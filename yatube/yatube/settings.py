@@ -1,15 +1,130 @@
 import os
+import tempfile
 
 
 POSTS_VIEWED = 10
 
 POST_CHARS_VIEWED = 15
 
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 5
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Размеры миниатюр картинок постов, которые используются в шаблонах.
+POST_THUMBNAILS = {
+    'wide': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Сколько записей о готовых миниатюрах держать в памяти процесса.
+POST_THUMBNAILS_LRU_SIZE = 4096
+# Сколько секунд не ставить в очередь миниатюры картинки, которую
+# не удалось прочитать.
+POST_THUMBNAILS_RETRY_AFTER = 60 * 60
+# kvstore sorl с поиском многих миниатюр одним запросом.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+# Загрузка картинок постов (posts.uploads.limit_upload_size): на файле
+# больше POST_IMAGE_MAX_UPLOAD_SIZE чтение запроса обрывается, картинка
+# больше POST_IMAGE_MAX_PIXELS отклоняется по заголовку. Загруженные картинки в фоне лишаются EXIF
+# и уменьшаются до POST_IMAGE_MAX_SIDE по большей стороне.
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_JPEG_QUALITY = 85
+# Размер копии, которая встраивается в страницу вместо картинки,
+# пока та загружается.
+POST_IMAGE_PREVIEW_SIZE = 16
+
+BACKGROUND_WORKERS = 2
+
+# Бюджеты SQL-запросов на один запрос к странице, по имени url.
+# Превышение пишется в лог core.queries, а в тестах роняет тест
+# (см. core.test_runner).
+QUERY_BUDGETS = {
+    'posts:index': 9,
+    'posts:group_list': 9,
+    'posts:profile': 9,
+    'posts:post_detail': 9,
+}
+QUERY_BUDGET_RAISE = False
+# Строки лога core.queries - готовый JSON, один запрос на строку.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'queries': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.queries': {
+            'handlers': ['queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+# Сколько запросов одной формы за запрос считать признаком N+1.
+QUERY_REPEAT_THRESHOLD = 3
+# Журнал медленных запросов к базе с их планами. Выключен, пока
+# SLOW_QUERY_LOG (путь к файлу) не задан.
+SLOW_QUERY_LOG = None
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 2 ** 20
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Размер страницы JSON API по умолчанию и наибольший для ?limit=.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Потоки новых постов и комментариев (SSE). Каждый поток занимает
+# поток сервера, поэтому их число на процесс ограничено.
+API_STREAM_MAX_CLIENTS = 50
+API_STREAM_HEARTBEAT = 15
+API_STREAM_QUEUE_SIZE = 100
+# Сколько пропущенных объектов выбирать из базы одним запросом
+# после переподключения.
+API_STREAM_BACKLOG = 100
+# Через сколько миллисекунд клиенту переподключаться.
+API_STREAM_RETRY = 3000
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Как отдавать файлы из MEDIA_ROOT (core.media.serve): None - из Django,
+# 'x-accel-redirect' - через nginx (internal location
+# MEDIA_ACCEL_REDIRECT_LOCATION с alias на MEDIA_ROOT), 'x-sendfile' -
+# через Apache mod_xsendfile.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_LOCATION = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Кэш уменьшенных копий картинок постов (posts:image_variant): давно
+# не читанные копии удаляются, когда кэш превышает размер в байтах.
+POST_IMAGE_VARIANT_CACHE_DIR = os.path.join(BASE_DIR, 'variants')
+POST_IMAGE_VARIANT_CACHE_SIZE = 512 * 2 ** 20
+POST_IMAGE_VARIANT_EVICTION_INTERVAL = 60
+
+# Метрики для Prometheus: каждый процесс сохраняет свои в METRICS_DIR
+# (вне каталога проекта), страница /metrics/ складывает их.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+METRICS_FLUSH_INTERVAL = 5
+# Файлы метрик, которые столько секунд не обновлялись, удаляются.
+METRICS_FILE_MAX_AGE = 60 * 60 * 24
+
+# Профили запросов по ключу сотрудника (manage.py profiling_token).
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+# Сколько функций показывать в профиле в админке.
+PROFILING_SUMMARY_LINES = 40
+
 SECRET_KEY = 'lcgy06%6)qtf8n5vzfetazxhubev@=%lgxi7^)=5&6jegv!r$k'
 
 DEBUG = True
@@ -34,10 +149,15 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.queries.QueryCountMiddleware',
+    'core.slow_queries.QueryOriginMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,11 +169,13 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEST_RUNNER = 'core.test_runner.ProjectTestRunner'
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,6 +200,18 @@ DATABASES = {
     }
 }
 
+# Кэш страниц, карточек, счётчиков лент и отметки страниц должны быть
+# общими для всех воркеров: сигнал сбрасывает их только в процессе,
+# который сохранил объект, а LocMemCache у каждого процесса свой.
+# Файловый кэш общий для процессов одного сервера и не добавляет
+# запросов к БД; при нескольких серверах сюда нужен Memcached или Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    }
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -110,6 +244,14 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'), )
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+# collectstatic добавляет в имена файлов хэш содержимого и рядом
+# кладёт сжатые копии .gz. Такие файлы кэшируются на STATIC_CACHE_MAX_AGE.
+STATICFILES_STORAGE = 'core.storage.GzipManifestStaticFilesStorage'
+
+STATIC_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
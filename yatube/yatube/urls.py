@@ -1,21 +1,29 @@
 from django.contrib import admin
 from django.urls import include, path
-from django.conf.urls.static import static
 from django.conf import settings
 
+from core import media, metrics, static
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics/', metrics.metrics, name='metrics'),
+    path(
+        settings.MEDIA_URL.lstrip('/') + '<path:path>',
+        media.serve,
+        name='media',
+    ),
+    path(
+        settings.STATIC_URL.lstrip('/') + '<path:path>',
+        static.serve,
+        name='static',
+    ),
     path('', include('posts.urls', namespace='posts')),
 ]
 
 
 handler404 = 'core.views.page_not_found'
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )